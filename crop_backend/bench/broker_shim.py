@@ -0,0 +1,294 @@
+"""
+In-memory stand-in for the parts of RabbitMQ and pika's BlockingConnection
+that the workers use.
+
+Each ShimConnection runs a dispatcher thread that plays the role of pika's
+connection thread: it delivers messages up to the channel's prefetch limit,
+runs add_callback_threadsafe callbacks and call_later timers, and nothing
+else touches channel state. Exchanges, bindings and dead-lettering follow
+RabbitMQ's direct-exchange semantics so routing bugs show up here too;
+x-consistent-hash exchanges spread routing keys over their bound queues by
+hash. Queues with x-message-ttl dead-letter expired messages from their
+head, as the retry delay queues rely on. Consumer priorities are not
+modelled.
+"""
+import time
+import zlib
+import heapq
+import queue
+import itertools
+import threading
+from collections import deque, namedtuple
+
+Method = namedtuple('Method', ['delivery_tag', 'routing_key', 'exchange', 'redelivered'])
+QueueDeclareOk = namedtuple('QueueDeclareOk', ['method'])
+QueueDeclareMethod = namedtuple('QueueDeclareMethod', ['queue', 'message_count', 'consumer_count'])
+
+
+class Message:
+    __slots__ = ('body', 'properties', 'routing_key', 'exchange', 'published_at', 'expires_at')
+
+    def __init__(self, body, properties, routing_key, exchange, ttl_ms=None):
+        self.body = body
+        self.properties = properties
+        self.routing_key = routing_key
+        self.exchange = exchange
+        self.published_at = time.monotonic()
+        self.expires_at = self.published_at + ttl_ms / 1000.0 if ttl_ms is not None else None
+
+
+class Broker:
+    """Queues, direct exchanges and per-queue counters shared by all connections."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queues = {}       # name -> deque[Message]
+        self.queue_args = {}   # name -> declare arguments
+        self.bindings = {}     # exchange -> [(routing_key, queue)]
+        self.exchange_types = {}  # exchange -> type
+        self.connections = []
+        self.on_settle = None  # callback(queue, message, outcome, settled_at)
+        self.counters = {}     # queue -> {"published": n, "acked": n, "nacked": n}
+
+    def declare_queue(self, name, arguments=None):
+        with self.lock:
+            if name not in self.queues:
+                self.queues[name] = deque()
+                self.queue_args[name] = arguments or {}
+                self.counters[name] = {"published": 0, "acked": 0, "nacked": 0}
+
+    def declare_exchange(self, name, exchange_type):
+        with self.lock:
+            self.exchange_types.setdefault(name, exchange_type)
+
+    def bind(self, exchange, queue_name, routing_key):
+        with self.lock:
+            self.bindings.setdefault(exchange, []).append((routing_key, queue_name))
+
+    def route(self, exchange, routing_key):
+        if exchange == '':
+            return [routing_key] if routing_key in self.queues else []
+        if self.exchange_types.get(exchange) == 'x-consistent-hash':
+            bound = [q for _, q in self.bindings.get(exchange, [])]
+            return [bound[zlib.crc32(routing_key.encode()) % len(bound)]] if bound else []
+        return [q for key, q in self.bindings.get(exchange, []) if key == routing_key]
+
+    def publish(self, exchange, routing_key, body, properties=None):
+        with self.lock:
+            targets = self.route(exchange, routing_key)
+            for name in targets:
+                ttl_ms = self.queue_args[name].get('x-message-ttl')
+                self.queues[name].append(Message(body, properties, routing_key, exchange, ttl_ms))
+                self.counters[name]["published"] += 1
+        for conn in list(self.connections):
+            conn.wake()
+        return bool(targets)
+
+    def pop(self, queue_name):
+        with self.lock:
+            q = self.queues.get(queue_name)
+            return q.popleft() if q else None
+
+    def requeue(self, queue_name, message):
+        with self.lock:
+            self.queues[queue_name].appendleft(message)
+        for conn in list(self.connections):
+            conn.wake()
+
+    def settle(self, queue_name, message, outcome):
+        with self.lock:
+            self.counters[queue_name][outcome] += 1
+        if self.on_settle:
+            self.on_settle(queue_name, message, outcome, time.monotonic())
+
+    def dead_letter(self, queue_name, message):
+        args = self.queue_args.get(queue_name, {})
+        exchange = args.get('x-dead-letter-exchange')
+        if exchange is not None:
+            self.publish(exchange, args.get('x-dead-letter-routing-key', message.routing_key), message.body, message.properties)
+
+    def expire(self):
+        """Dead-letters expired messages. Like RabbitMQ, only from the head of each queue."""
+        now = time.monotonic()
+        expired = []
+        with self.lock:
+            for name, q in self.queues.items():
+                while q and q[0].expires_at is not None and q[0].expires_at <= now:
+                    expired.append((name, q.popleft()))
+        for name, message in expired:
+            self.dead_letter(name, message)
+
+    def depth(self, queue_name):
+        with self.lock:
+            return len(self.queues.get(queue_name, ()))
+
+    def depths(self):
+        with self.lock:
+            return {name: len(q) for name, q in self.queues.items()}
+
+
+class ShimChannel:
+    def __init__(self, connection):
+        self.connection = connection
+        self.broker = connection.broker
+        self.is_open = True
+        self.prefetch_count = 0
+        self.consumers = []       # (consumer_tag, queue, callback)
+        self.unacked = {}         # delivery_tag -> (queue, Message)
+        self._tags = itertools.count(1)
+        self._consumer_tags = itertools.count(1)
+
+    # --- Topology ---
+    def exchange_declare(self, exchange, exchange_type='direct', durable=False, **kwargs):
+        self.broker.declare_exchange(exchange, exchange_type)
+
+    def queue_declare(self, queue, durable=False, arguments=None, passive=False, **kwargs):
+        if not passive:
+            self.broker.declare_queue(queue, arguments)
+        return QueueDeclareOk(QueueDeclareMethod(queue, self.broker.depth(queue), 0))
+
+    def queue_bind(self, queue, exchange, routing_key=None, **kwargs):
+        self.broker.bind(exchange, queue, routing_key)
+
+    # --- Consuming ---
+    def basic_qos(self, prefetch_count=0, **kwargs):
+        self.prefetch_count = prefetch_count
+
+    def basic_consume(self, queue, on_message_callback, **kwargs):
+        consumer_tag = f"ctag-{next(self._consumer_tags)}"
+        self.consumers.append((consumer_tag, queue, on_message_callback))
+        self.connection.wake()
+        return consumer_tag
+
+    def basic_cancel(self, consumer_tag):
+        # Nothing is delivered between dispatch rounds, so nothing is pending
+        self.consumers = [c for c in self.consumers if c[0] != consumer_tag]
+        return []
+
+    def stop_consuming(self):
+        self.consumers = []
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self._settle(delivery_tag, multiple, 'acked')
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        for queue_name, message in self._settle(delivery_tag, multiple, 'nacked'):
+            if requeue:
+                self.broker.requeue(queue_name, message)
+            else:
+                self.broker.dead_letter(queue_name, message)
+
+    def _settle(self, delivery_tag, multiple, outcome):
+        if multiple:
+            tags = sorted(tag for tag in self.unacked if tag <= delivery_tag)
+        else:
+            tags = [delivery_tag]
+        settled = []
+        for tag in tags:
+            if tag not in self.unacked:
+                raise RuntimeError(f"PRECONDITION_FAILED - unknown delivery tag {tag}")
+            queue_name, message = self.unacked.pop(tag)
+            self.broker.settle(queue_name, message, outcome)
+            settled.append((queue_name, message))
+        self.connection.wake()
+        return settled
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, **kwargs):
+        if isinstance(body, str):
+            body = body.encode()
+        self.broker.publish(exchange, routing_key, body, properties)
+
+    def dispatch(self):
+        """Delivers ready messages up to the prefetch limit. Returns True if any were delivered."""
+        delivered = False
+        progress = True
+        while progress:
+            progress = False
+            for _, queue_name, callback in list(self.consumers):
+                if self.prefetch_count and len(self.unacked) >= self.prefetch_count:
+                    return delivered
+                message = self.broker.pop(queue_name)
+                if message is None:
+                    continue
+                tag = next(self._tags)
+                self.unacked[tag] = (queue_name, message)
+                callback(self, Method(tag, message.routing_key, message.exchange, False), message.properties, message.body)
+                delivered = progress = True
+        return delivered
+
+
+class ShimConnection:
+    """Plays pika.BlockingConnection; the dispatcher thread is the connection thread."""
+
+    def __init__(self, broker, name='shim'):
+        self.broker = broker
+        self.name = name
+        self.is_closed = False
+        self._channels = []
+        self._events = queue.Queue()
+        self._timers = []
+        self._timer_ids = itertools.count(1)
+        self._cancelled = set()
+        self._thread = None
+        broker.connections.append(self)
+
+    def channel(self):
+        channel = ShimChannel(self)
+        self._channels.append(channel)
+        return channel
+
+    def wake(self):
+        self._events.put(None)
+
+    def add_callback_threadsafe(self, callback):
+        if self.is_closed:
+            raise RuntimeError("Connection is closed")
+        self._events.put(callback)
+
+    def call_later(self, delay, callback):
+        timer_id = next(self._timer_ids)
+        heapq.heappush(self._timers, (time.monotonic() + delay, timer_id, callback))
+        self.wake()
+        return timer_id
+
+    def remove_timeout(self, timer_id):
+        self._cancelled.add(timer_id)
+
+    def start(self, setup):
+        """Runs setup(connection) and then the dispatch loop on the connection thread."""
+        self._thread = threading.Thread(target=self._run, args=(setup,), name=f"{self.name}-connection", daemon=True)
+        self._thread.start()
+
+    def _run(self, setup):
+        setup(self)
+        while not self.is_closed:
+            now = time.monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                _, timer_id, callback = heapq.heappop(self._timers)
+                if timer_id in self._cancelled:
+                    self._cancelled.discard(timer_id)
+                    continue
+                callback()
+
+            self.broker.expire()
+            for channel in self._channels:
+                channel.dispatch()
+
+            timeout = max(0.0, self._timers[0][0] - time.monotonic()) if self._timers else 0.5
+            try:
+                event = self._events.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            while True:
+                if event is not None:
+                    event()
+                try:
+                    event = self._events.get_nowait()
+                except queue.Empty:
+                    break
+
+    def close(self):
+        self.is_closed = True
+        self.wake()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
@@ -0,0 +1,123 @@
+"""
+Closed-loop HTTP load test for dashboard_api.
+
+Runs N concurrent clients against a set of dashboard routes for a fixed
+duration and reports throughput and latency percentiles. To compare two
+builds (e.g. the sync psycopg2 version and the async one), run it against
+each with the same settings, save the results with --output and then:
+
+    python bench/dashboard_load.py --compare sync.json async.json
+
+Set RESPONSE_CACHE_TTL_S=0 on dashboard_api to measure the database path
+rather than the response cache.
+
+Requires httpx (pip install httpx).
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+import httpx
+
+DEFAULT_PATHS = [
+    "/reports?limit=50&fields=summary",
+    "/reports?limit=20",
+    "/alerts?limit=50",
+    "/reports/map?bbox=68,6,98,37&zoom=5",
+]
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+async def client(http, paths, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        path = random.choice(paths)
+        started = time.monotonic()
+        try:
+            response = await http.get(path)
+            if response.status_code >= 400:
+                errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+        except httpx.HTTPError as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            continue
+        latencies.append((time.monotonic() - started) * 1000)
+
+
+async def run(base_url, paths, concurrency, duration_s, warmup_s):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as http:
+        if warmup_s > 0:
+            await asyncio.gather(*(client(http, paths, time.monotonic() + warmup_s, [], {}) for _ in range(concurrency)))
+
+        latencies, errors = [], {}
+        started = time.monotonic()
+        deadline = started + duration_s
+        await asyncio.gather(*(client(http, paths, deadline, latencies, errors) for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    ordered = sorted(latencies)
+    return {
+        "base_url": base_url,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": len(ordered),
+        "errors": errors,
+        "requests_per_s": round(len(ordered) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(ordered, 0.50), 2),
+            "p95": round(percentile(ordered, 0.95), 2),
+            "p99": round(percentile(ordered, 0.99), 2),
+            "max": round(ordered[-1], 2) if ordered else 0.0,
+        },
+    }
+
+
+def compare(baseline_path, candidate_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+
+    rows = [("requests/s", baseline["requests_per_s"], candidate["requests_per_s"])]
+    for p in ("p50", "p95", "p99", "max"):
+        rows.append((f"{p} ms", baseline["latency_ms"][p], candidate["latency_ms"][p]))
+
+    print(f"{'metric':<12}{'baseline':>12}{'candidate':>12}{'change':>10}")
+    for name, before, after in rows:
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"{name:<12}{before:>12}{after:>12}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8002")
+    parser.add_argument("--path", action="append", dest="paths", help="Route to request (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--output", help="Write the result as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    result = asyncio.run(run(args.base_url, args.paths or DEFAULT_PATHS, args.concurrency, args.duration, args.warmup))
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if result["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+fp32 vs int8, thread vs process inference benchmark for ml_service.
+
+For every (model, config) pair, starts ml_service under uvicorn with that
+configuration and sends closed-loop POST /analyze requests over a fixed
+image sample. It reports:
+  * throughput and latency percentiles on the /analyze path
+  * images/sec per allotted core, and per CPU-second actually used
+  * memory (PSS) of the service and its inference processes
+  * accuracy against --labels-csv, and agreement with the first model
+
+    python bench/ml_inference_bench.py --images-root /data/agri_prepared \\
+        --labels-csv /data/agri_prepared/dataset_labels_with_severity.csv \\
+        --models ../model/crop_model.onnx ../model/crop_model.int8.onnx \\
+        --configs thread:1:4 process:4 --requests 400 --concurrency 16
+
+A config is mode:workers[:intra_op_threads]. Pick the cheapest row whose
+accuracy is acceptable. The ML_MAX_BATCH_* settings can be passed through
+the environment as usual.
+
+Needs ml_service's requirements. CPU and memory figures are read from
+/proc (Linux only).
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+import subprocess
+import http.client
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ML_SERVICE_DIR = os.path.join(BACKEND_ROOT, 'ml_service')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+# --- Inputs ---
+def load_sample(images_root, labels_csv, count, seed):
+    """Returns [(absolute_path, {"crop": ..., "severity_level": ...} or None)]."""
+    if labels_csv:
+        with open(labels_csv, newline='') as f:
+            rows = [
+                (os.path.join(images_root, row["filename"]), {"crop": row["crop"], "severity_level": row.get("severity_level")})
+                for row in csv.DictReader(f)
+                if row.get("split", "test") == "test"
+            ]
+    else:
+        rows = [
+            (os.path.join(root, name), None)
+            for root, _, names in os.walk(images_root)
+            for name in names
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+    rows = [row for row in rows if os.path.exists(row[0])]
+    random.Random(seed).shuffle(rows)
+    return rows[:count]
+
+
+def parse_config(text):
+    parts = text.split(':')
+    config = {"mode": parts[0], "workers": int(parts[1]) if len(parts) > 1 else 1}
+    if len(parts) > 2:
+        config["intra_op_threads"] = int(parts[2])
+    return config
+
+
+# --- Service under test ---
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_service(model_path, config, port):
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [BACKEND_ROOT, os.environ.get('PYTHONPATH')])),
+        MODEL_PATH=os.path.abspath(model_path),
+        ML_INFERENCE_MODE=config["mode"],
+        ML_INFERENCE_WORKERS=str(config["workers"]),
+    )
+    if "intra_op_threads" in config:
+        env["ML_INTRA_OP_THREADS"] = str(config["intra_op_threads"])
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+        cwd=ML_SERVICE_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"ml_service exited with {process.returncode}")
+        try:
+            status, body = request(port, 'GET', '/model')
+            if status == 200:
+                return process, body
+        except OSError:
+            pass
+        time.sleep(0.25)
+    process.kill()
+    raise RuntimeError("ml_service did not start within 120 s")
+
+
+def request(port, method, path, payload=None, conn=None):
+    conn = conn or http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    body = json.dumps(payload) if payload is not None else None
+    conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    return response.status, json.loads(response.read() or b'null')
+
+
+def process_tree(pid):
+    pids = [pid]
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as f:
+            pids.extend(int(child) for child in f.read().split())
+    return pids
+
+
+def cpu_seconds(pids):
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            total += int(fields[11]) + int(fields[12]) # utime + stime
+        except OSError:
+            pass
+    return total / CLOCK_TICKS
+
+
+def pss_mb(pids):
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/smaps_rollup') as f:
+                for line in f:
+                    if line.startswith('Pss:'):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return round(total / 1024, 1)
+
+
+# --- Load ---
+def percentile(ordered, p):
+    return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2) if ordered else None
+
+
+def drive(port, sample, total_requests, concurrency):
+    """Closed-loop clients cycling through the sample. Returns (latencies_ms, predictions, errors)."""
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+    latencies, predictions, errors = [], {}, {}
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            path, _ = sample[i % len(sample)]
+            started = time.monotonic()
+            try:
+                status, body = request(port, 'POST', '/analyze', {"file_path": path}, conn)
+            except (OSError, http.client.HTTPException) as e:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                status, body = type(e).__name__, None
+            elapsed = (time.monotonic() - started) * 1000
+            with lock:
+                if status == 200:
+                    latencies.append(elapsed)
+                    predictions.setdefault(path, body)
+                else:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), predictions, errors
+
+
+def accuracy(sample, predictions, reference):
+    labeled = [(path, labels) for path, labels in sample if labels and path in predictions]
+    result = {}
+    if labeled:
+        result["crop_accuracy"] = round(sum(predictions[p].get("crop") == l["crop"] for p, l in labeled) / len(labeled), 4)
+        with_severity = [(p, l) for p, l in labeled if l.get("severity_level")]
+        if with_severity:
+            result["severity_accuracy"] = round(
+                sum(predictions[p].get("severity_level") == l["severity_level"] for p, l in with_severity) / len(with_severity), 4
+            )
+    if reference is not None:
+        shared = [p for p in predictions if p in reference]
+        if shared:
+            result["crop_agreement_with_reference"] = round(
+                sum(predictions[p].get("crop") == reference[p].get("crop") for p in shared) / len(shared), 4
+            )
+    return result
+
+
+def run_one(model_path, config, sample, args, reference):
+    port = free_port()
+    process, info = start_service(model_path, config, port)
+    try:
+        # Warm-up pass so lazily initialized paths are not timed
+        drive(port, sample, min(len(sample), args.concurrency * 2), args.concurrency)
+        pids = process_tree(process.pid)
+        cpu_before = cpu_seconds(pids)
+        started = time.monotonic()
+        latencies, predictions, errors = drive(port, sample, args.requests, args.concurrency)
+        elapsed = time.monotonic() - started
+        cpu_used = cpu_seconds(pids) - cpu_before
+        memory = pss_mb(pids)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    cores = min(os.cpu_count() or 1, config["workers"] * info.get("intra_op_threads", 1))
+    throughput = len(latencies) / elapsed if elapsed else 0.0
+    return {
+        "model": os.path.basename(model_path),
+        "model_version": info.get("model_version"),
+        "quantization": info.get("quantization", info.get("backend")),
+        "mode": info.get("inference_mode"),
+        "workers": info.get("inference_workers"),
+        "intra_op_threads": info.get("intra_op_threads"),
+        "cores": cores,
+        "images_per_s": round(throughput, 2),
+        "images_per_s_per_core": round(throughput / cores, 2),
+        "images_per_cpu_s": round(len(latencies) / cpu_used, 2) if cpu_used else None,
+        "latency_ms": {"p50": percentile(latencies, 0.50), "p95": percentile(latencies, 0.95), "p99": percentile(latencies, 0.99)},
+        "pss_mb": memory,
+        "errors": errors,
+        **accuracy(sample, predictions, reference),
+    }, predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images-root', required=True)
+    parser.add_argument('--labels-csv', help='Notebook dataset CSV (filename, crop, severity_level, split); test split is used')
+    parser.add_argument('--models', nargs='+', default=[
+        os.path.join(BACKEND_ROOT, '..', 'model', 'crop_model.onnx'),
+        os.path.join(BACKEND_ROOT, '..', 'model', 'crop_model.int8.onnx'),
+    ], help='The first model is the reference for agreement')
+    parser.add_argument('--configs', nargs='+', default=['thread:1', f'process:{os.cpu_count() or 1}'])
+    parser.add_argument('--sample', type=int, default=200, help='Distinct images to cycle through')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write all rows as JSON')
+    args = parser.parse_args()
+
+    sample = load_sample(args.images_root, args.labels_csv, args.sample, args.seed)
+    if not sample:
+        parser.error("no images found")
+
+    rows = []
+    reference = None
+    for model_path in args.models:
+        for config_text in args.configs:
+            row, predictions = run_one(model_path, parse_config(config_text), sample, args, reference)
+            rows.append(row)
+            print(json.dumps(row))
+        if reference is None:
+            reference = predictions
+
+    print()
+    header = f"{'model':<28} {'mode':<8} {'w':>3} {'intra':>5} {'img/s':>8} {'img/s/core':>10} {'img/cpu-s':>9} {'p95 ms':>8} {'PSS MB':>8} {'crop acc':>8}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(
+            f"{row['model']:<28} {row['mode']:<8} {row['workers']:>3} {row['intra_op_threads']:>5} "
+            f"{row['images_per_s']:>8} {row['images_per_s_per_core']:>10} {str(row['images_per_cpu_s']):>9} "
+            f"{str(row['latency_ms']['p95']):>8} {row['pss_mb']:>8} {str(row.get('crop_accuracy', '-')):>8}"
+        )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k != 'output'}, "results": rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Code shared by the Python services (workers, dashboard_api and ml_service)."""
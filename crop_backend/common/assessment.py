@@ -0,0 +1,21 @@
+# --- Alert Thresholds ---
+# The single definition of how a fused report's overall_health_score maps to
+# an alert level. Scores are in [0, 1]; lower is worse.
+HIGH_ALERT_BELOW = 0.5
+MEDIUM_ALERT_BELOW = 0.7
+
+# Reports scoring below this are listed by GET /alerts by default. The
+# predicate of the partial index idx_fused_reports_alerts (db/init.sql and
+# db/migrations) hard-codes the same value; change them together, or the
+# alerts query stops using the index.
+ALERT_HEALTH_THRESHOLD = MEDIUM_ALERT_BELOW
+
+
+def alert_level_for(overall_health_score):
+    if overall_health_score is None:
+        return None
+    if overall_health_score < HIGH_ALERT_BELOW:
+        return 'HIGH'
+    if overall_health_score < MEDIUM_ALERT_BELOW:
+        return 'MEDIUM'
+    return 'LOW'
@@ -0,0 +1,92 @@
+import os
+import threading
+
+# --- Configuration ---
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_TIMEOUT_S = float(os.environ.get('CIRCUIT_RESET_TIMEOUT_S', '10'))
+CIRCUIT_MAX_RESET_TIMEOUT_S = float(os.environ.get('CIRCUIT_MAX_RESET_TIMEOUT_S', '300'))
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker around one dependency.
+
+    It opens after failure_threshold failures in a row. While it is open
+    allow() is False; the owner probes the dependency after retry_after()
+    seconds and calls close() on success or probe_failed() otherwise. Each
+    failed probe doubles the wait, up to max_reset_timeout_s. on_open is
+    called (on the failing thread, outside the lock) whenever the circuit
+    opens.
+    """
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout_s=CIRCUIT_RESET_TIMEOUT_S,
+                 max_reset_timeout_s=CIRCUIT_MAX_RESET_TIMEOUT_S, on_open=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.max_reset_timeout_s = max_reset_timeout_s
+        self.on_open = on_open
+
+        self._lock = threading.Lock()
+        self._open = False
+        self._failures = 0
+        self._failed_probes = 0
+        self._times_opened = 0
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._open
+
+    def allow(self):
+        with self._lock:
+            return not self._open
+
+    def check(self):
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self):
+        """Counts one failure; returns True if it opened the circuit."""
+        with self._lock:
+            self._failures += 1
+            if self._open or self._failures < self.failure_threshold:
+                return False
+            self._open = True
+            self._failed_probes = 0
+            self._times_opened += 1
+        if self.on_open:
+            self.on_open()
+        return True
+
+    def retry_after(self):
+        with self._lock:
+            return min(self.reset_timeout_s * 2 ** self._failed_probes, self.max_reset_timeout_s)
+
+    def probe_failed(self):
+        with self._lock:
+            self._failed_probes += 1
+
+    def close(self):
+        with self._lock:
+            self._open = False
+            self._failures = 0
+            self._failed_probes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": "open" if self._open else "closed",
+                "consecutive_failures": self._failures,
+                "failed_probes": self._failed_probes,
+                "times_opened": self._times_opened,
+            }
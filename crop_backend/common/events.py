@@ -0,0 +1,19 @@
+import json
+
+# --- Report Events ---
+# data_fusion_worker sends a NOTIFY on this channel, inside the transaction
+# that inserts the fused report, so listeners only hear about committed rows.
+REPORT_FUSED_CHANNEL = 'report_fused'
+
+
+def report_fused_payload(submission_id, latitude, longitude, overall_health_score):
+    return json.dumps({
+        "submission_id": submission_id,
+        "latitude": float(latitude) if latitude is not None else None,
+        "longitude": float(longitude) if longitude is not None else None,
+        "overall_health_score": overall_health_score,
+    })
+
+
+def parse_report_fused(payload):
+    return json.loads(payload)
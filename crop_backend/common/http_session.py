@@ -0,0 +1,42 @@
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Configuration ---
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '10'))
+
+
+class KeepAliveSession:
+    """
+    A requests.Session bound to one base URL, with a connection pool sized
+    for the number of threads that call it, so every request reuses an
+    already-open keep-alive connection.
+    """
+
+    def __init__(self, base_url, pool_maxsize=HTTP_POOL_MAXSIZE):
+        self.base_url = base_url.rstrip('/')
+        self.pool_maxsize = pool_maxsize
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, pool_block=True)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+    def post(self, path, **kwargs):
+        return self.session.post(f"{self.base_url}{path}", **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.session.get(f"{self.base_url}{path}", **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def stats(self):
+        # All requests go to base_url, so its host pool is the only one
+        pool = self.adapter.poolmanager.connection_from_url(self.base_url)
+        return {
+            "base_url": self.base_url,
+            "pool_maxsize": self.pool_maxsize,
+            "connections_opened": pool.num_connections,
+            "requests": pool.num_requests,
+        }
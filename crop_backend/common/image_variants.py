@@ -0,0 +1,63 @@
+import io
+import mmap
+
+from PIL import Image
+
+from common.storage import INFERENCE_VARIANT_SIZE, THUMBNAIL_EDGE
+
+# --- Configuration ---
+THUMBNAIL_JPEG_QUALITY = 80
+
+
+class VariantError(Exception):
+    """Raised when an upload cannot be decoded to build its variants."""
+
+
+def model_input(image, size):
+    """
+    The model's resize: a draft-mode decode (JPEGs are downscaled while
+    decoding) followed by an exact bilinear resize to size x size. Shared
+    with ml_service's preprocessing, so the stored inference variant has
+    the pixels ml_service would have computed from the original.
+    """
+    image.draft('RGB', (size, size))
+    return image.convert('RGB').resize((size, size), Image.BILINEAR)
+
+
+def make_variants(file_path, inference_size=INFERENCE_VARIANT_SIZE, thumbnail_edge=THUMBNAIL_EDGE):
+    """
+    Decodes an upload and returns encoded bytes for its variants:
+      * "inference": model_input(inference_size) as lossless PNG; resizing
+        it again to inference_size leaves it unchanged
+      * "thumbnail": longest edge thumbnail_edge, aspect ratio kept, as JPEG
+    The file is memory-mapped and decoded once per variant, each time in
+    draft mode at that variant's size.
+    """
+    try:
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            inference = model_input(Image.open(mm), inference_size)
+            thumbnail = Image.open(mm)
+            thumbnail.draft('RGB', (thumbnail_edge, thumbnail_edge))
+            thumbnail = thumbnail.convert('RGB')
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        # ValueError covers mmap of an empty file
+        raise VariantError(f"Cannot decode {file_path}: {e}") from e
+
+    thumbnail.thumbnail((thumbnail_edge, thumbnail_edge), Image.BILINEAR)
+    return {
+        "inference": encode_png(inference),
+        "thumbnail": encode_jpeg(thumbnail, THUMBNAIL_JPEG_QUALITY),
+    }
+
+
+def encode_png(image):
+    buffer = io.BytesIO()
+    # Level 1: the variant is small and written once per upload on the hot path
+    image.save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+def encode_jpeg(image, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
@@ -0,0 +1,154 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest, start_http_server
+
+# --- Configuration ---
+METRICS_PORT = int(os.environ.get('METRICS_PORT', '0'))
+QUEUE_DEPTH_INTERVAL_S = float(os.environ.get('QUEUE_DEPTH_INTERVAL_S', '15'))
+
+# Buckets from 1 ms to ~2 min; covers DB calls through queue waits
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# --- Metrics ---
+STAGE_SECONDS = Histogram(
+    'cropic_stage_duration_seconds',
+    'Time spent in one processing stage (queue_wait, ml_call, db_write, weather_fetch, ...).',
+    ['service', 'stage'],
+    buckets=LATENCY_BUCKETS
+)
+MESSAGES = Counter(
+    'cropic_messages_total',
+    'Queue messages handled, by outcome.',
+    ['service', 'queue', 'outcome']
+)
+QUEUE_MESSAGES = Gauge(
+    'cropic_queue_messages',
+    'Ready messages in a queue: consumer lag for work queues, depth for DLQs.',
+    ['queue']
+)
+END_TO_END_SECONDS = Histogram(
+    'cropic_pipeline_end_to_end_seconds',
+    'Time from ingestion until the fused report is committed.',
+    buckets=LATENCY_BUCKETS
+)
+ANALYSIS_CACHE_LOOKUPS = Counter(
+    'cropic_analysis_cache_lookups_total',
+    'analysis_cache lookups by outcome (hit, miss, bypass); hit rate = hit / (hit + miss).',
+    ['outcome']
+)
+CIRCUIT_OPEN = Gauge(
+    'cropic_circuit_open',
+    '1 while the circuit breaker around a dependency is open and consumption is paused.',
+    ['service', 'dependency']
+)
+DESIRED_REPLICAS = Gauge(
+    'cropic_desired_replicas',
+    'Worker replicas suggested by per-shard consumer lag (see common/sharding.py).',
+    ['service']
+)
+HTTP_SECONDS = Histogram(
+    'cropic_http_request_duration_seconds',
+    'HTTP request latency by route template.',
+    ['service', 'method', 'route', 'status'],
+    buckets=LATENCY_BUCKETS
+)
+
+
+@contextmanager
+def time_stage(service, stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(service, stage).observe(time.perf_counter() - started)
+
+
+def timed(service, stage, fn):
+    """Wraps fn so every call is observed as the given stage."""
+    def wrapper(*args, **kwargs):
+        with time_stage(service, stage):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+# --- Trace Timestamps ---
+# Queue messages carry a "trace" dict of wall-clock epoch seconds, stamped by
+# each service as the submission passes through, e.g.
+#   {"ingested_at": ..., "analysis_started_at": ..., "analysis_done_at": ...}
+def stamp(trace, event):
+    trace = dict(trace or {})
+    trace[event] = time.time()
+    return trace
+
+
+def observe_since(service, stage, trace, event):
+    """Observes now - trace[event] as a stage, if the message carried it."""
+    if trace and trace.get(event):
+        STAGE_SECONDS.labels(service, stage).observe(max(0.0, time.time() - trace[event]))
+
+
+# --- Exposition ---
+def start_metrics_server(port=METRICS_PORT):
+    """Serves /metrics on a sidecar HTTP port (for the workers)."""
+    if port:
+        start_http_server(port)
+        print(f"Serving metrics on :{port}/metrics")
+
+
+def watch_queue_depths(connection, queues, interval_s=QUEUE_DEPTH_INTERVAL_S, on_sample=None):
+    """
+    Samples ready-message counts with passive queue declares every interval_s
+    and passes each {queue: count} sample to on_sample. Runs on the pika
+    connection thread via call_later, on a channel of its own: a passive
+    declare of a missing queue closes its channel, which must not be the one
+    the consumers use. A queue that cannot be sampled is left out of that
+    sample and tried again on the next one.
+    """
+    channel = None
+
+    def sample():
+        nonlocal channel
+        if connection.is_closed:
+            return
+        try:
+            depths = {}
+            for queue in queues:
+                try:
+                    if channel is None or not channel.is_open:
+                        channel = connection.channel()
+                    result = channel.queue_declare(queue=queue, passive=True)
+                except Exception as e:
+                    print(f"Could not sample depth of {queue}: {e}")
+                    continue
+                depths[queue] = result.method.message_count
+                QUEUE_MESSAGES.labels(queue).set(depths[queue])
+            if on_sample:
+                on_sample(depths)
+        except Exception as e:
+            print(f"Queue depth sampling failed: {e}")
+        finally:
+            if not connection.is_closed:
+                connection.call_later(interval_s, sample)
+
+    sample()
+
+
+def instrument_app(app, service):
+    """Adds per-route latency metrics and a /metrics endpoint to a FastAPI app."""
+    from fastapi import Request, Response
+
+    @app.middleware("http")
+    async def observe_request(request: Request, call_next):
+        started = time.perf_counter()
+        response = await call_next(request)
+        route = request.scope.get("route")
+        HTTP_SECONDS.labels(
+            service, request.method, route.path if route else "unmatched", str(response.status_code)
+        ).observe(time.perf_counter() - started)
+        return response
+
+    @app.get('/metrics', include_in_schema=False)
+    def metrics():
+        return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,14 @@
+import hashlib
+
+
+def file_version(path):
+    """
+    model_version derived from the weights: onnx-<first 12 hex digits of the
+    file's sha256>. Used by model/export_onnx.py, model/quantize_onnx.py and
+    ml_service (when no version is configured), so all three agree.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return f"onnx-{digest.hexdigest()[:12]}"
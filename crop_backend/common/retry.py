@@ -0,0 +1,87 @@
+import os
+
+import pika
+
+# --- Configuration ---
+# A message that fails with a retryable error is republished to a delay
+# queue and comes back after RETRY_BASE_DELAY_S * RETRY_BACKOFF_FACTOR ** n
+# seconds (5 s, 20 s, 80 s, 320 s by default). After RETRY_MAX_ATTEMPTS
+# retries it is dead-lettered; tools/replay_dlq.py moves it back later.
+RETRY_BASE_DELAY_S = float(os.environ.get('RETRY_BASE_DELAY_S', '5'))
+RETRY_BACKOFF_FACTOR = float(os.environ.get('RETRY_BACKOFF_FACTOR', '4'))
+RETRY_MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', '4'))
+
+# Retries already made for a message; absent on first delivery
+ATTEMPT_HEADER = 'x-retry-attempt'
+# Times a message was moved back out of its DLQ
+REPLAY_HEADER = 'x-replay-count'
+
+
+class RetryableError(Exception):
+    """A failure that may succeed later (dependency down, timeout, ...)."""
+
+
+def attempt_of(properties):
+    headers = (properties.headers if properties else None) or {}
+    try:
+        return int(headers.get(ATTEMPT_HEADER, 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+class RetryPolicy:
+    """
+    Delayed retries for one work queue through TTL queues. Each delay has
+    its own durable queue, <queue>.retry.<delay>ms, without consumers; its
+    messages expire after the delay and are dead-lettered back onto the
+    work queue through the default exchange. One queue per delay (rather
+    than a per-message expiration) keeps every queue FIFO, so a long delay
+    never holds up a short one.
+    """
+
+    def __init__(self, queue_name, base_delay_s=RETRY_BASE_DELAY_S, backoff_factor=RETRY_BACKOFF_FACTOR, max_attempts=RETRY_MAX_ATTEMPTS):
+        self.queue_name = queue_name
+        self.max_attempts = max_attempts
+        self.delays_ms = [int(base_delay_s * backoff_factor ** n * 1000) for n in range(max_attempts)]
+
+    def retry_queue(self, attempt):
+        return f"{self.queue_name}.retry.{self.delays_ms[attempt]}ms"
+
+    @property
+    def retry_queues(self):
+        return [self.retry_queue(attempt) for attempt in range(self.max_attempts)]
+
+    def declare(self, channel):
+        # Named after their delay, so changing the settings declares new
+        # queues instead of conflicting with the arguments of existing ones
+        for attempt, delay_ms in enumerate(self.delays_ms):
+            channel.queue_declare(queue=self.retry_queue(attempt), durable=True, arguments={
+                "x-message-ttl": delay_ms,
+                "x-dead-letter-exchange": '',
+                "x-dead-letter-routing-key": self.queue_name
+            })
+
+    def can_retry(self, properties):
+        return attempt_of(properties) < self.max_attempts
+
+    def schedule(self, channel, body, properties):
+        """
+        Republishes the message to its next delay queue. Returns False when
+        it has no retries left. The caller acks the original afterwards.
+        """
+        attempt = attempt_of(properties)
+        if attempt >= self.max_attempts:
+            return False
+        headers = dict((properties.headers if properties else None) or {})
+        headers[ATTEMPT_HEADER] = attempt + 1
+        channel.basic_publish(
+            exchange='',
+            routing_key=self.retry_queue(attempt),
+            body=body,
+            properties=pika.BasicProperties(
+                delivery_mode=2,
+                content_type=properties.content_type if properties else None,
+                headers=headers
+            )
+        )
+        return True
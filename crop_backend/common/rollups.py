@@ -0,0 +1,67 @@
+import math
+
+# --- Daily Report Rollups ---
+# report_daily_rollups holds one row per (day, crop, disease, region,
+# growth_stage) with counts and health score sums. data_fusion_worker upserts
+# it in the same transaction that inserts the reports, so the analytics
+# endpoints never scan fused_reports. Regions are square lat/lon grid cells
+# keyed "<lat index>:<lon index>". migrations/005 backfills with the same
+# grouping, so change both together.
+REGION_CELL_DEG = 1.0
+UNKNOWN = 'unknown'
+
+ROLLUP_UPSERT_SQL = """
+    INSERT INTO report_daily_rollups AS r (day, crop, disease, region, growth_stage, report_count, health_score_sum, health_score_count, high_alert_count, medium_alert_count)
+    VALUES %s
+    ON CONFLICT (day, crop, disease, region, growth_stage) DO UPDATE SET
+        report_count = r.report_count + EXCLUDED.report_count,
+        health_score_sum = r.health_score_sum + EXCLUDED.health_score_sum,
+        health_score_count = r.health_score_count + EXCLUDED.health_score_count,
+        high_alert_count = r.high_alert_count + EXCLUDED.high_alert_count,
+        medium_alert_count = r.medium_alert_count + EXCLUDED.medium_alert_count
+"""
+
+
+def region_of(latitude, longitude):
+    if latitude is None or longitude is None:
+        return UNKNOWN
+    return f"{math.floor(float(latitude) / REGION_CELL_DEG)}:{math.floor(float(longitude) / REGION_CELL_DEG)}"
+
+
+def region_center(region):
+    """(latitude, longitude) of the middle of a region cell, or (None, None)."""
+    if region == UNKNOWN:
+        return None, None
+    lat_index, lon_index = (int(v) for v in region.split(':'))
+    return (lat_index + 0.5) * REGION_CELL_DEG, (lon_index + 0.5) * REGION_CELL_DEG
+
+
+def dimension(value):
+    return str(value)[:100] if value else UNKNOWN
+
+
+def daily_rollup_rows(reports):
+    """
+    Aggregates (day, crop, disease, latitude, longitude, growth_stage,
+    health_score, alert_level) tuples into rollup upsert rows. Rows are
+    sorted so concurrent workers lock rollup rows in the same order.
+    """
+    totals = {}
+    for day, crop, disease, latitude, longitude, growth_stage, health_score, alert_level in reports:
+        key = (day, dimension(crop), dimension(disease), region_of(latitude, longitude), dimension(growth_stage))
+        total = totals.setdefault(key, [0, 0.0, 0, 0, 0])
+        total[0] += 1
+        if health_score is not None:
+            total[1] += health_score
+            total[2] += 1
+        if alert_level == 'HIGH':
+            total[3] += 1
+        elif alert_level == 'MEDIUM':
+            total[4] += 1
+    return [key + tuple(total) for key, total in sorted(totals.items())]
+
+
+def region_bbox(region):
+    """[min_lon, min_lat, max_lon, max_lat] of a region cell key."""
+    lat_index, lon_index = (int(v) for v in region.split(':'))
+    return [lon_index * REGION_CELL_DEG, lat_index * REGION_CELL_DEG, (lon_index + 1) * REGION_CELL_DEG, (lat_index + 1) * REGION_CELL_DEG]
@@ -0,0 +1,107 @@
+import os
+import math
+
+import pika
+
+from common.metrics import DESIRED_REPLICAS
+
+# --- Configuration ---
+# Every publisher and consumer must agree on SHARD_COUNT. Consistent hashing
+# means growing it moves only ~1/n of the keys, but shard queues dropped by
+# shrinking it keep their messages until they are drained by hand.
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', '4'))
+
+# Replica REPLICA_INDEX of REPLICA_COUNT consumes its home shards
+# (shard % REPLICA_COUNT == REPLICA_INDEX) at HOME_PRIORITY and every other
+# shard at STEAL_PRIORITY. Without them every shard is home.
+REPLICA_INDEX = os.environ.get('REPLICA_INDEX')
+REPLICA_COUNT = os.environ.get('REPLICA_COUNT')
+HOME_PRIORITY = 10
+STEAL_PRIORITY = 0
+
+# The autoscaling signal asks for one replica per AUTOSCALE_TARGET_LAG ready
+# messages, and at least one per shard that is that far behind on its own.
+AUTOSCALE_TARGET_LAG = int(os.environ.get('AUTOSCALE_TARGET_LAG', '100'))
+AUTOSCALE_MIN_REPLICAS = int(os.environ.get('AUTOSCALE_MIN_REPLICAS', '1'))
+AUTOSCALE_MAX_REPLICAS = int(os.environ.get('AUTOSCALE_MAX_REPLICAS', '16'))
+
+# Carries the shard key, so retried and replayed messages can be routed to
+# the shard they were first published to
+SHARD_KEY_HEADER = 'x-shard-key'
+
+
+class ShardedQueue:
+    """
+    A work queue split into shard queues, <name>.shard.<n>, behind a
+    consistent-hash exchange, <name>.shards (rabbitmq_consistent_hash_exchange
+    plugin). Publishers route by a shard key, so all messages with one key
+    land on the same shard in order, and a burst for one key only backs up
+    its own shard.
+
+    Consumers use one channel for all shards, with a channel-wide prefetch
+    and consumer priorities. The broker gives a replica its home shards
+    first and lets it take from other shards only when their home consumers
+    are full. An idle replica therefore steals work, and a busy one never
+    takes on more than its prefetch.
+
+    The unsharded queue <name> is still consumed, at steal priority. It
+    holds messages published before sharding and those replayed from the
+    DLQ. Shards dead-letter to the same DLQ as it does.
+    """
+
+    def __init__(self, name, dlx_name, shards=SHARD_COUNT):
+        self.name = name
+        self.dlx_name = dlx_name
+        self.exchange = f"{name}.shards"
+        self.shard_queues = [f"{name}.shard.{n}" for n in range(shards)]
+
+    @property
+    def queues(self):
+        return self.shard_queues + [self.name]
+
+    def declare(self, channel):
+        """Declares the exchange and shard queues; the unsharded queue is declared by its owner."""
+        channel.exchange_declare(exchange=self.exchange, exchange_type='x-consistent-hash', durable=True)
+        for queue in self.shard_queues:
+            channel.queue_declare(queue=queue, durable=True, arguments={
+                "x-dead-letter-exchange": self.dlx_name,
+                "x-dead-letter-routing-key": self.name
+            })
+            # For this exchange type the binding key is the shard's weight
+            channel.queue_bind(queue=queue, exchange=self.exchange, routing_key='1')
+
+    def publish(self, channel, shard_key, body, properties=None, **kwargs):
+        """Publishes through the shard exchange, recording shard_key in SHARD_KEY_HEADER of properties."""
+        properties = properties or pika.BasicProperties(delivery_mode=2)
+        properties.headers = dict(properties.headers or {}, **{SHARD_KEY_HEADER: str(shard_key)})
+        channel.basic_publish(exchange=self.exchange, routing_key=str(shard_key), body=body, properties=properties, **kwargs)
+
+    def consumer_priorities(self, replica_index=REPLICA_INDEX, replica_count=REPLICA_COUNT):
+        """[(queue, x-priority)] for every queue this replica consumes."""
+        priorities = []
+        for n, queue in enumerate(self.shard_queues):
+            home = replica_index is None or replica_count is None or n % int(replica_count) == int(replica_index)
+            priorities.append((queue, HOME_PRIORITY if home else STEAL_PRIORITY))
+        priorities.append((self.name, STEAL_PRIORITY))
+        return priorities
+
+    def depth(self, channel):
+        """Ready messages across the shard queues and the unsharded queue."""
+        return sum(channel.queue_declare(queue=queue, passive=True).method.message_count for queue in self.queues)
+
+    def observe_lag(self, service, depths):
+        """Sets the desired replica gauge from a {queue: ready messages} sample."""
+        DESIRED_REPLICAS.labels(service).set(desired_replicas([depths.get(queue, 0) for queue in self.queues]))
+
+
+def shard_key_of(properties):
+    """The shard key a message was published with, or None for unsharded publishes."""
+    headers = (properties.headers if properties else None) or {}
+    key = headers.get(SHARD_KEY_HEADER)
+    return key.decode() if isinstance(key, bytes) else key
+
+
+def desired_replicas(lags, target=AUTOSCALE_TARGET_LAG, min_replicas=AUTOSCALE_MIN_REPLICAS, max_replicas=AUTOSCALE_MAX_REPLICAS):
+    hot_shards = sum(1 for lag in lags if lag > target)
+    wanted = max(math.ceil(sum(lags) / target), hot_shards, min_replicas)
+    return min(wanted, max_replicas)
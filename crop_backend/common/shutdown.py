@@ -0,0 +1,40 @@
+import os
+import signal
+import threading
+
+# --- Configuration ---
+# How long a worker waits for in-flight messages to settle after SIGTERM.
+# Keep it below the orchestrator's grace period (stop_grace_period in
+# docker-compose); anything still unacked afterwards is redelivered.
+DRAIN_TIMEOUT_S = float(os.environ.get('DRAIN_TIMEOUT_S', '30'))
+
+
+class GracefulShutdown:
+    """
+    Turns SIGTERM/SIGINT into a flag. Signal handlers run on the main thread
+    in the middle of pika's I/O loop and must not touch the connection, so
+    the connection thread polls the flag instead (see watch).
+    """
+
+    def __init__(self):
+        self.requested = threading.Event()
+
+    def install(self):
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+
+    def _on_signal(self, signum, frame):
+        print(f"Received {signal.Signals(signum).name}; draining before exit.")
+        self.requested.set()
+
+    def watch(self, connection, on_request, interval_s=0.5):
+        """Calls on_request() on the connection thread once shutdown is requested."""
+        def check():
+            if connection.is_closed:
+                return
+            if self.requested.is_set():
+                on_request()
+            else:
+                connection.call_later(interval_s, check)
+
+        connection.call_later(interval_s, check)
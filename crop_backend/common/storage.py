@@ -0,0 +1,180 @@
+import os
+import shutil
+import tempfile
+import mimetypes
+
+# --- Configuration ---
+# STORAGE_BACKEND=local keeps objects under STORAGE_ROOT on a shared volume.
+# STORAGE_BACKEND=s3 uses an S3-compatible bucket (MinIO in docker-compose);
+# credentials come from the usual AWS_* environment variables.
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
+STORAGE_ROOT = os.environ.get('STORAGE_ROOT', 'uploads/store')
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')
+S3_BUCKET = os.environ.get('S3_BUCKET', 'cropic-images')
+S3_REGION = os.environ.get('S3_REGION', 'us-east-1')
+S3_PRESIGN_TTL_S = int(os.environ.get('S3_PRESIGN_TTL_S', '3600'))
+
+# Variant sizes are part of their keys, so changing them produces new
+# objects instead of serving stale ones. INFERENCE_VARIANT_SIZE should match
+# the model's input size (img_size in the labels JSON).
+INFERENCE_VARIANT_SIZE = int(os.environ.get('INFERENCE_VARIANT_SIZE', '224'))
+THUMBNAIL_EDGE = int(os.environ.get('THUMBNAIL_EDGE', '256'))
+
+
+class ObjectNotFound(Exception):
+    pass
+
+
+# --- Object Keys ---
+# Objects are addressed by the sha256 of the uploaded file (the
+# content_hash analysis_worker stores on the submission), so identical
+# uploads share one original and one set of variants, and every key
+# names immutable content.
+def original_key(digest, filename=''):
+    extension = os.path.splitext(filename)[1].lower()
+    return f"originals/{digest[:2]}/{digest}{extension}"
+
+
+def variant_key(digest, variant, extension='jpg'):
+    return f"variants/{digest[:2]}/{digest}/{variant}.{extension}"
+
+
+def inference_key(digest):
+    # Lossless, so inference on it matches inference on the original
+    return variant_key(digest, f"inference_{INFERENCE_VARIANT_SIZE}", 'png')
+
+
+def thumbnail_key(digest):
+    return variant_key(digest, f"thumbnail_{THUMBNAIL_EDGE}")
+
+
+# --- Backends ---
+class LocalStorage:
+    """
+    Objects as files under root. Writes go to a temporary file that is
+    renamed into place, so readers never see partial objects. local_path
+    lets readers memory-map or sendfile objects instead of copying them.
+    """
+
+    def __init__(self, root=STORAGE_ROOT):
+        self.root = os.path.abspath(root)
+
+    def ensure_ready(self):
+        os.makedirs(self.root, exist_ok=True)
+
+    def local_path(self, key):
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid object key: {key}")
+        return path
+
+    def url(self, key):
+        return None
+
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    def put_file(self, key, source_path):
+        # copyfile uses sendfile/copy_file_range on Linux, so the bytes
+        # never pass through Python
+        self._write(key, lambda f: shutil.copyfile(source_path, f.name))
+
+    def put_bytes(self, key, data):
+        self._write(key, lambda f: f.write(data))
+
+    def get_bytes(self, key):
+        try:
+            with open(self.local_path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+
+    def _write(self, key, fill):
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix='.tmp-', delete=False) as f:
+            try:
+                fill(f)
+            except BaseException:
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, path)
+
+
+class S3Storage:
+    """
+    Objects in an S3-compatible bucket. Readers fetch bytes (only the small
+    variants are read on hot paths) and browsers are redirected to
+    presigned URLs, so images never stream through our services.
+    """
+
+    def __init__(self, bucket=S3_BUCKET, endpoint_url=S3_ENDPOINT_URL, region=S3_REGION, presign_ttl_s=S3_PRESIGN_TTL_S):
+        import boto3
+        from botocore.config import Config
+        from botocore.exceptions import ClientError
+
+        self.bucket = bucket
+        self.presign_ttl_s = presign_ttl_s
+        self.client_error = ClientError
+        self.client = boto3.client(
+            's3', endpoint_url=endpoint_url, region_name=region,
+            config=Config(max_pool_connections=16, retries={"max_attempts": 3, "mode": "standard"})
+        )
+
+    def ensure_ready(self):
+        try:
+            self.client.head_bucket(Bucket=self.bucket)
+        except self.client_error as e:
+            if e.response.get("Error", {}).get("Code") not in ('404', 'NoSuchBucket'):
+                raise
+            self.client.create_bucket(Bucket=self.bucket)
+
+    def local_path(self, key):
+        return None
+
+    def url(self, key):
+        return self.client.generate_presigned_url(
+            'get_object', Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=self.presign_ttl_s
+        )
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except self.client_error as e:
+            if e.response.get("Error", {}).get("Code") in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def put_file(self, key, source_path):
+        self.client.upload_file(source_path, self.bucket, key, ExtraArgs={"ContentType": content_type(key)})
+
+    def put_bytes(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type(key))
+
+    def get_bytes(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        except self.client_error as e:
+            if e.response.get("Error", {}).get("Code") in ('404', 'NoSuchKey'):
+                raise ObjectNotFound(key)
+            raise
+
+
+def content_type(key):
+    return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+
+_storage = None
+
+def get_storage():
+    """The process-wide storage backend selected by STORAGE_BACKEND."""
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == 's3':
+            _storage = S3Storage()
+        elif STORAGE_BACKEND == 'local':
+            _storage = LocalStorage()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return _storage
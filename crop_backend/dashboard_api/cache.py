@@ -0,0 +1,181 @@
+import os
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict, deque
+
+import asyncpg
+
+from common.events import REPORT_FUSED_CHANNEL, parse_report_fused
+from db import DATABASE_URL
+
+# --- Configuration ---
+RESPONSE_CACHE_TTL_S = float(os.environ.get('RESPONSE_CACHE_TTL_S', '60'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '2048'))
+# Invalidations remembered for responses that were being built while they arrived
+RESPONSE_CACHE_EVENT_HISTORY = 256
+
+
+class CachedResponse:
+    __slots__ = ('body', 'etag', 'headers', 'expires_at', 'invalidate_when')
+
+    def __init__(self, body, headers, expires_at, invalidate_when):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.headers = headers
+        self.expires_at = expires_at
+        self.invalidate_when = invalidate_when
+
+
+class ResponseCache:
+    """
+    In-process cache of serialized JSON responses. Entries expire after a TTL
+    and are evicted early when a report event matches their invalidate_when
+    predicate, so only responses that could contain the new report are dropped.
+
+    Every invalidation and flush bumps generation. A response built from a
+    read that started at an older generation is not stored if one of the
+    events since then matches its predicate, since that read may predate
+    the report.
+    """
+
+    def __init__(self, ttl_s=RESPONSE_CACHE_TTL_S, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.generation = 0
+        self._recent = deque(maxlen=RESPONSE_CACHE_EVENT_HISTORY) # (generation, event); None for a flush
+
+        # --- Stats ---
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.flushes = 0
+        self.stale_sets = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, body, headers=None, invalidate_when=None, ttl_s=None, generation=None):
+        """
+        Stores and returns the entry. generation is self.generation from
+        before the response was read; if an event since then invalidates it,
+        the entry is returned without being stored.
+        """
+        entry = CachedResponse(
+            body, headers or {}, time.monotonic() + (ttl_s or self.ttl_s),
+            invalidate_when or (lambda event: True)
+        )
+        with self._lock:
+            if generation is not None and self._invalidated_since(generation, entry.invalidate_when):
+                self.stale_sets += 1
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _invalidated_since(self, generation, invalidate_when):
+        if generation == self.generation:
+            return False
+        if not self._recent or self._recent[0][0] > generation + 1:
+            return True # Older events were forgotten; assume the worst
+        return any(event is None or invalidate_when(event) for event_generation, event in self._recent if event_generation > generation)
+
+    def invalidate(self, event):
+        """Evicts every entry whose predicate matches the event."""
+        with self._lock:
+            self.generation += 1
+            self._recent.append((self.generation, event))
+            stale = [key for key, entry in self._entries.items() if entry.invalidate_when(event)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._recent.append((self.generation, None))
+            self._entries.clear()
+            self.flushes += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "flushes": self.flushes,
+                "stale_sets": self.stale_sets,
+            }
+
+
+class ReportEventListener:
+    """
+    LISTENs for report_fused notifications on a dedicated connection and
+    invalidates the cache. After a reconnect the whole cache is flushed,
+    since events may have been missed while disconnected.
+    """
+
+    def __init__(self, cache, dsn=DATABASE_URL, health_check_interval_s=5.0):
+        self.cache = cache
+        self.dsn = dsn
+        self.health_check_interval_s = health_check_interval_s
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            event = parse_report_fused(payload)
+        except ValueError:
+            print(f"Ignoring malformed report event: {payload}")
+            return
+        self.cache.invalidate(event)
+
+    async def _run(self):
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                await conn.add_listener(REPORT_FUSED_CHANNEL, self._on_notify)
+                self.cache.clear()
+                print(f"Listening for '{REPORT_FUSED_CHANNEL}' events.")
+
+                # Notifications arrive via the callback; just watch the connection
+                while True:
+                    await asyncio.sleep(self.health_check_interval_s)
+                    await conn.execute('SELECT 1')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Report event listener error: {e}. Reconnecting in 5 seconds...")
+                self.cache.clear()
+                await asyncio.sleep(5)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
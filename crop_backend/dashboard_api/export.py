@@ -0,0 +1,249 @@
+import os
+import asyncio
+import datetime
+
+import orjson
+from fastapi.concurrency import run_in_threadpool
+
+# --- Configuration ---
+EXPORT_TIMEOUT_S = float(os.environ.get('EXPORT_TIMEOUT_S', '3600'))
+EXPORT_FETCH_ROWS = int(os.environ.get('EXPORT_FETCH_ROWS', '2000'))
+EXPORT_CHUNK_BYTES = int(os.environ.get('EXPORT_CHUNK_BYTES', str(64 * 1024)))
+EXPORT_PARQUET_ROW_GROUP = int(os.environ.get('EXPORT_PARQUET_ROW_GROUP', '50000'))
+MAX_CONCURRENT_EXPORTS = int(os.environ.get('MAX_CONCURRENT_EXPORTS', '2'))
+
+# --- Report Export ---
+# Exports stream rows straight from Postgres to the client: CSV through
+# COPY ... TO STDOUT, NDJSON and Parquet through a server-side cursor that
+# fetches EXPORT_FETCH_ROWS at a time. At most a few chunks (or one Parquet
+# row group) are held in memory, whatever the number of rows. Each export
+# holds one pool connection for its whole duration, hence the
+# MAX_CONCURRENT_EXPORTS cap, and runs with EXPORT_TIMEOUT_S instead of the
+# pool's command timeout.
+#
+# (sql expression, column name, type) in output order. "json" columns are
+# only exported with fields=full.
+EXPORT_COLUMNS = [
+    ("fr.id", "id", "int64"),
+    ("fr.submission_id", "submission_id", "int64"),
+    ("fr.user_id", "user_id", "int64"),
+    ("fr.created_at", "created_at", "timestamp"),
+    ("fr.submitted_at", "submitted_at", "timestamp"),
+    ("fr.latitude::float8", "latitude", "float64"),
+    ("fr.longitude::float8", "longitude", "float64"),
+    ("fr.growth_stage", "growth_stage", "string"),
+    ("s.status", "status", "string"),
+    ("fr.aggregated_analysis->'ml_analysis'->>'crop'", "crop", "string"),
+    ("fr.aggregated_analysis->'ml_analysis'->>'disease'", "disease", "string"),
+    ("(fr.aggregated_analysis->'ml_analysis'->>'confidence')::float8", "confidence", "float64"),
+    ("fr.overall_health_score::float8", "overall_health_score", "float64"),
+    ("fr.alert_level", "alert_level", "string"),
+    ("fr.aggregated_analysis->>'summary'", "summary", "string"),
+    ("fr.aggregated_analysis", "aggregated_analysis", "json"),
+    ("fr.weather_data", "weather_data", "json"),
+    ("fr.satellite_data", "satellite_data", "json"),
+    ("fr.final_assessment", "final_assessment", "json"),
+]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ExportLimiter:
+    """Non-blocking cap on concurrent exports; callers get False instead of queueing."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+
+    def try_acquire(self):
+        if self.active >= self.limit:
+            return False
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+
+
+def export_columns(fields):
+    return [column for column in EXPORT_COLUMNS if fields == 'full' or column[2] != 'json']
+
+
+def build_export_query(fields, start=None, end=None, bbox=None, min_health_score=None, max_health_score=None, alert_level=None):
+    """
+    Returns (query, params). start and end are inclusive dates (UTC); the
+    created_at range lets Postgres prune monthly partitions, and bbox is
+    answered by the GiST index on point(longitude, latitude).
+    """
+    conditions, params = [], []
+
+    def param(value):
+        params.append(value)
+        return f"${len(params)}"
+
+    if start is not None:
+        conditions.append(f"fr.created_at >= {param(utc_midnight(start))}")
+    if end is not None:
+        conditions.append(f"fr.created_at < {param(utc_midnight(end + datetime.timedelta(days=1)))}")
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        conditions.append(
+            f"point(fr.longitude::float8, fr.latitude::float8) <@ box(point({param(min_lon)}, {param(min_lat)}), point({param(max_lon)}, {param(max_lat)}))"
+        )
+    if min_health_score is not None:
+        conditions.append(f"fr.overall_health_score >= {param(min_health_score)}")
+    if max_health_score is not None:
+        conditions.append(f"fr.overall_health_score <= {param(max_health_score)}")
+    if alert_level is not None:
+        conditions.append(f"fr.alert_level = {param(alert_level)}")
+
+    select = ", ".join(f"{expression} AS {name}" for expression, name, _ in export_columns(fields))
+    query = f"SELECT {select} FROM fused_reports fr JOIN submissions s ON s.id = fr.submission_id AND s.created_at = fr.submitted_at"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    # Ascending on the partition key, so partitions are read in order without a sort
+    query += " ORDER BY fr.created_at, fr.id"
+    return query, params
+
+
+def utc_midnight(day):
+    return datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.timezone.utc)
+
+
+# --- Writers ---
+async def stream_csv(pool, query, params):
+    """
+    Streams COPY (query) TO STDOUT as CSV with a header. asyncpg hands COPY
+    data to a callback, so the chunks go through a small bounded queue; when
+    the client reads slowly the queue fills and COPY stops reading from the
+    socket.
+    """
+    queue = asyncio.Queue(maxsize=8)
+
+    async def copy():
+        async with pool.acquire() as conn:
+            await conn.copy_from_query(query, *params, output=queue.put, format='csv', header=True, timeout=EXPORT_TIMEOUT_S)
+
+    task = asyncio.ensure_future(copy())
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+                continue
+            getter.cancel()
+            while not queue.empty():
+                yield queue.get_nowait()
+            task.result() # Re-raises a failed COPY
+            return
+    finally:
+        # Client went away or the stream failed: abort the COPY
+        task.cancel()
+
+
+async def iter_records(pool, query, params):
+    """Yields records from a server-side cursor, EXPORT_FETCH_ROWS per round trip."""
+    async with pool.acquire() as conn:
+        async with conn.transaction(isolation='repeatable_read', readonly=True):
+            async for record in conn.cursor(query, *params, prefetch=EXPORT_FETCH_ROWS, timeout=EXPORT_TIMEOUT_S):
+                yield record
+
+
+async def stream_ndjson(pool, query, params):
+    buffer = bytearray()
+    async for record in iter_records(pool, query, params):
+        buffer += orjson.dumps(dict(record))
+        buffer += b"\n"
+        if len(buffer) >= EXPORT_CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ChunkSink:
+    """Write-only file object that collects what pyarrow writes so it can be streamed out."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def stream_parquet(pool, query, params, fields):
+    """
+    Writes one Parquet row group per EXPORT_PARQUET_ROW_GROUP rows and
+    streams it as soon as it is written; the footer follows the last group.
+    JSON columns are stored as JSON text. Encoding and compression are CPU
+    bound and run in the threadpool, off the event loop.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "string": pa.string(),
+        "timestamp": pa.timestamp('us', tz='UTC'),
+        "json": pa.string(),
+    }
+    columns = export_columns(fields)
+    schema = pa.schema([(name, arrow_types[kind]) for _, name, kind in columns])
+    json_columns = {name for _, name, kind in columns if kind == 'json'}
+
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    batch = {name: [] for _, name, _ in columns}
+    rows = 0
+
+    def flush_batch():
+        writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+        for values in batch.values():
+            values.clear()
+
+    async for record in iter_records(pool, query, params):
+        for name, value in record.items():
+            if name in json_columns and value is not None:
+                value = orjson.dumps(value).decode()
+            batch[name].append(value)
+        rows += 1
+        if rows % EXPORT_PARQUET_ROW_GROUP == 0:
+            await run_in_threadpool(flush_batch)
+            yield sink.drain()
+
+    if rows % EXPORT_PARQUET_ROW_GROUP or not rows:
+        await run_in_threadpool(flush_batch)
+    await run_in_threadpool(writer.close)
+    yield sink.drain()
@@ -0,0 +1,141 @@
+import os
+import time
+import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# --- Configuration ---
+# 2 decimal places is a tile of roughly 1.1 km x 1.1 km
+TILE_DECIMALS = int(os.environ.get('ENRICHMENT_TILE_DECIMALS', '2'))
+WEATHER_CACHE_TTL_S = float(os.environ.get('WEATHER_CACHE_TTL_S', str(3 * 3600)))
+SATELLITE_CACHE_TTL_S = float(os.environ.get('SATELLITE_CACHE_TTL_S', str(6 * 3600)))
+CACHE_MAX_ENTRIES = int(os.environ.get('ENRICHMENT_CACHE_MAX_ENTRIES', '10000'))
+ENRICHMENT_THREADS = int(os.environ.get('ENRICHMENT_THREADS', '8'))
+
+
+class TileCache:
+    """
+    Thread-safe TTL cache with LRU eviction. Concurrent lookups of a key that
+    is being fetched wait for that fetch instead of starting their own.
+    """
+
+    def __init__(self, name, ttl_s, max_entries=CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}            # key -> Future
+
+        # --- Stats ---
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def get_or_fetch(self, key, fetch):
+        owner = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            pending = self._inflight.get(key)
+            if pending is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                pending = Future()
+                self._inflight[key] = pending
+                owner = True
+        if not owner:
+            return pending.result()
+
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+                del self._inflight[key]
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            del self._inflight[key]
+        pending.set_result(value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "errors": self.errors,
+                "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+
+
+def tile_of(latitude, longitude):
+    """Rounds a coordinate to the cache tile it falls in."""
+    return round(float(latitude), TILE_DECIMALS), round(float(longitude), TILE_DECIMALS)
+
+
+class Enricher:
+    """
+    Fetches weather and satellite data for a plot concurrently, serving both
+    from per-tile caches. Providers are called with the tile coordinates so
+    every plot in a tile sees the same cached values.
+    """
+
+    def __init__(self, weather_provider, satellite_provider, threads=ENRICHMENT_THREADS):
+        self.weather_provider = weather_provider
+        self.satellite_provider = satellite_provider
+        self.weather_cache = TileCache('weather', WEATHER_CACHE_TTL_S)
+        self.satellite_cache = TileCache('satellite', SATELLITE_CACHE_TTL_S)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='enrichment')
+
+    def _weather(self, tile_lat, tile_lon):
+        return self.weather_cache.get_or_fetch(
+            (tile_lat, tile_lon),
+            lambda: self.weather_provider(tile_lat, tile_lon)
+        )
+
+    def _satellite(self, tile_lat, tile_lon, growth_stage):
+        capture_date = datetime.date.today().isoformat()
+        return self.satellite_cache.get_or_fetch(
+            (tile_lat, tile_lon, growth_stage, capture_date),
+            lambda: self.satellite_provider(tile_lat, tile_lon, growth_stage)
+        )
+
+    def enrich_async(self, latitude, longitude, growth_stage):
+        """Starts both lookups and returns their futures."""
+        tile_lat, tile_lon = tile_of(latitude, longitude)
+        weather = self.executor.submit(self._weather, tile_lat, tile_lon)
+        satellite = self.executor.submit(self._satellite, tile_lat, tile_lon, growth_stage)
+        return weather, satellite
+
+    def enrich(self, latitude, longitude, growth_stage):
+        """Returns (weather_data, satellite_data) for a plot."""
+        weather, satellite = self.enrich_async(latitude, longitude, growth_stage)
+        return weather.result(), satellite.result()
+
+    def stats(self):
+        return {
+            "weather": self.weather_cache.stats(),
+            "satellite": self.satellite_cache.stats(),
+        }
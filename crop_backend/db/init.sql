@@ -6,8 +6,70 @@ CREATE TABLE users (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Creates the monthly range partitions <parent>_pYYYYMM for `months` months
+-- starting at first_month, skipping those that exist. data_fusion_worker
+-- calls it periodically to stay PARTITION_MONTHS_AHEAD months ahead; rows
+-- outside every monthly partition land in <parent>_default and are moved
+-- into their monthly partition when it is created.
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(parent regclass, first_month date, months integer)
+RETURNS integer AS $$
+DECLARE
+    month_start timestamp;
+    range_start timestamptz;
+    range_end timestamptz;
+    partition_name text;
+    default_name text := format('%s_default', parent::text);
+    has_rows boolean;
+    created integer := 0;
+BEGIN
+    FOR i IN 0..months - 1 LOOP
+        month_start := date_trunc('month', first_month) + make_interval(months => i);
+        range_start := month_start AT TIME ZONE 'UTC';
+        range_end := (month_start + interval '1 month') AT TIME ZONE 'UTC';
+        partition_name := format('%s_p%s', parent::text, to_char(month_start, 'YYYYMM'));
+        CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+
+        -- Rows of this month already in the default partition make CREATE ...
+        -- PARTITION OF fail, so they are taken out and routed back in once the
+        -- partition exists. Deleting submissions cascades to their
+        -- fused_reports, which are saved and restored the same way.
+        has_rows := false;
+        IF to_regclass(default_name) IS NOT NULL THEN
+            EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE created_at >= %L AND created_at < %L)', default_name, range_start, range_end)
+                INTO has_rows;
+        END IF;
+        IF has_rows THEN
+            DROP TABLE IF EXISTS pg_temp.partition_moved_rows, pg_temp.partition_moved_reports;
+            EXECUTE format('CREATE TEMP TABLE partition_moved_rows ON COMMIT DROP AS SELECT * FROM %I WHERE created_at >= %L AND created_at < %L', default_name, range_start, range_end);
+            IF parent = 'submissions'::regclass THEN
+                EXECUTE 'CREATE TEMP TABLE partition_moved_reports ON COMMIT DROP AS SELECT fr.* FROM fused_reports fr JOIN partition_moved_rows m ON fr.submission_id = m.id AND fr.submitted_at = m.created_at';
+            END IF;
+            EXECUTE format('DELETE FROM %I WHERE created_at >= %L AND created_at < %L', default_name, range_start, range_end);
+        END IF;
+
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+            partition_name, parent, range_start, range_end
+        );
+        created := created + 1;
+
+        IF has_rows THEN
+            EXECUTE format('INSERT INTO %s SELECT * FROM partition_moved_rows', parent);
+            IF parent = 'submissions'::regclass THEN
+                EXECUTE 'INSERT INTO fused_reports SELECT * FROM partition_moved_reports';
+            END IF;
+            DROP TABLE pg_temp.partition_moved_rows;
+            DROP TABLE IF EXISTS pg_temp.partition_moved_reports;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- submissions and fused_reports are range partitioned by month on
+-- created_at, so keys on them include created_at.
 CREATE TABLE submissions (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id INTEGER NOT NULL,
     original_filename VARCHAR(255) NOT NULL,
     storage_path VARCHAR(255) NOT NULL,
@@ -16,16 +78,35 @@ CREATE TABLE submissions (
     growth_stage VARCHAR(100),
     status VARCHAR(50) DEFAULT 'RECEIVED',
     analysis_result_json JSONB,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    -- sha256 of the uploaded file, set by analysis_worker
+    content_hash CHAR(64),
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at),
     CONSTRAINT fk_user
         FOREIGN KEY(user_id)
         REFERENCES users(id)
         ON DELETE CASCADE
+) PARTITION BY RANGE (created_at);
+
+-- ML results by image content and model version; see analysis_worker
+CREATE TABLE analysis_cache (
+    content_hash CHAR(64) NOT NULL,
+    model_version VARCHAR(64) NOT NULL,
+    analysis_result_json JSONB NOT NULL,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (content_hash, model_version)
 );
 
+-- One report per submission is enforced by data_fusion_worker, which locks
+-- the submission row and checks for an existing report before inserting (a
+-- unique index on a partitioned table would have to include created_at).
 CREATE TABLE fused_reports (
-    id SERIAL PRIMARY KEY,
-    submission_id INTEGER UNIQUE NOT NULL,
+    id SERIAL,
+    submission_id INTEGER NOT NULL,
+    -- created_at of the submission; completes the foreign key and lets joins prune partitions
+    submitted_at TIMESTAMP WITH TIME ZONE NOT NULL,
     user_id INTEGER NOT NULL,
     latitude DECIMAL(10, 8),
     longitude DECIMAL(11, 8),
@@ -34,13 +115,53 @@ CREATE TABLE fused_reports (
     weather_data JSONB,
     satellite_data JSONB,
     final_assessment JSONB,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    -- Typed copies of final_assessment fields, written by data_fusion_worker
+    overall_health_score REAL,
+    alert_level VARCHAR(10),
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at),
     CONSTRAINT fk_submission
-        FOREIGN KEY(submission_id)
-        REFERENCES submissions(id)
+        FOREIGN KEY(submission_id, submitted_at)
+        REFERENCES submissions(id, created_at)
         ON DELETE CASCADE,
     CONSTRAINT fk_user_fused
         FOREIGN KEY(user_id)
         REFERENCES users(id)
         ON DELETE CASCADE
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE submissions_default PARTITION OF submissions DEFAULT;
+CREATE TABLE fused_reports_default PARTITION OF fused_reports DEFAULT;
+SELECT ensure_monthly_partitions('submissions', CURRENT_DATE, 4);
+SELECT ensure_monthly_partitions('fused_reports', CURRENT_DATE, 4);
+
+-- GET /reports/{submission_id} and the fusion worker's duplicate check
+CREATE INDEX idx_fused_reports_submission_id ON fused_reports (submission_id);
+
+-- Keyset pagination for GET /reports: ORDER BY created_at DESC, id DESC
+CREATE INDEX idx_fused_reports_created_at_id ON fused_reports (created_at DESC, id DESC);
+
+-- Viewport queries for GET /reports/map: point(lon, lat) <@ box(...)
+CREATE INDEX idx_fused_reports_location ON fused_reports USING gist (point(longitude::float8, latitude::float8));
+
+-- GET /alerts: overall_health_score < threshold ORDER BY created_at DESC.
+-- The partial index covers the default threshold (common/assessment.py).
+CREATE INDEX idx_fused_reports_health_created_at ON fused_reports (overall_health_score, created_at DESC);
+CREATE INDEX idx_fused_reports_alerts ON fused_reports (created_at DESC) WHERE overall_health_score < 0.7;
+
+-- Daily aggregates behind GET /analytics/*, upserted by data_fusion_worker
+-- in the transaction that inserts the reports (see common/rollups.py).
+-- region is a lat/lon grid cell; unknown dimensions are stored as 'unknown'.
+CREATE TABLE report_daily_rollups (
+    day DATE NOT NULL,
+    crop VARCHAR(100) NOT NULL,
+    disease VARCHAR(100) NOT NULL,
+    region VARCHAR(32) NOT NULL,
+    growth_stage VARCHAR(100) NOT NULL,
+    report_count INTEGER NOT NULL DEFAULT 0,
+    health_score_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    health_score_count INTEGER NOT NULL DEFAULT 0,
+    high_alert_count INTEGER NOT NULL DEFAULT 0,
+    medium_alert_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, crop, disease, region, growth_stage)
 );
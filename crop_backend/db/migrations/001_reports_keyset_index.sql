@@ -0,0 +1,4 @@
+-- init.sql only runs on an empty data volume. Apply this to existing
+-- databases to get the index that GET /reports pages on.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_fused_reports_created_at_id
+    ON fused_reports (created_at DESC, id DESC);
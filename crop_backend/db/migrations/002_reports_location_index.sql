@@ -0,0 +1,3 @@
+-- GiST index behind the bbox filter of GET /reports/map and its tile routes.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_fused_reports_location
+    ON fused_reports USING gist (point(longitude::float8, latitude::float8));
@@ -0,0 +1,24 @@
+-- Materializes overall_health_score and alert_level as typed columns so
+-- GET /alerts and GET /reports/map stop parsing final_assessment per row.
+-- Thresholds mirror common/assessment.py (HIGH < 0.5, MEDIUM < 0.7).
+ALTER TABLE fused_reports ADD COLUMN IF NOT EXISTS overall_health_score REAL;
+ALTER TABLE fused_reports ADD COLUMN IF NOT EXISTS alert_level VARCHAR(10);
+
+UPDATE fused_reports
+SET overall_health_score = (final_assessment->>'overall_health_score')::real
+WHERE overall_health_score IS NULL
+  AND final_assessment ? 'overall_health_score';
+
+UPDATE fused_reports
+SET alert_level = CASE
+        WHEN overall_health_score < 0.5 THEN 'HIGH'
+        WHEN overall_health_score < 0.7 THEN 'MEDIUM'
+        ELSE 'LOW'
+    END
+WHERE alert_level IS NULL
+  AND overall_health_score IS NOT NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_fused_reports_health_created_at
+    ON fused_reports (overall_health_score, created_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_fused_reports_alerts
+    ON fused_reports (created_at DESC) WHERE overall_health_score < 0.7;
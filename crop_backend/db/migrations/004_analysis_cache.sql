@@ -0,0 +1,14 @@
+-- Persistent ML result cache for analysis_worker. Re-uploads of the same
+-- image (same sha256) reuse the stored result instead of calling ml_service;
+-- keying on model_version makes a model upgrade start from an empty cache.
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    content_hash CHAR(64) NOT NULL,
+    model_version VARCHAR(64) NOT NULL,
+    analysis_result_json JSONB NOT NULL,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (content_hash, model_version)
+);
+
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
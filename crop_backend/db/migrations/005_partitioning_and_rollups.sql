@@ -0,0 +1,188 @@
+-- Converts submissions and fused_reports to monthly range partitions on
+-- created_at and adds the report_daily_rollups table, backfilled from the
+-- existing reports. Matches db/init.sql.
+--
+-- Rewrites both tables in one transaction: stop the workers and
+-- ingestion_api first. Requires 001-004.
+BEGIN;
+
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(parent regclass, first_month date, months integer)
+RETURNS integer AS $$
+DECLARE
+    month_start timestamp;
+    range_start timestamptz;
+    range_end timestamptz;
+    partition_name text;
+    default_name text := format('%s_default', parent::text);
+    has_rows boolean;
+    created integer := 0;
+BEGIN
+    FOR i IN 0..months - 1 LOOP
+        month_start := date_trunc('month', first_month) + make_interval(months => i);
+        range_start := month_start AT TIME ZONE 'UTC';
+        range_end := (month_start + interval '1 month') AT TIME ZONE 'UTC';
+        partition_name := format('%s_p%s', parent::text, to_char(month_start, 'YYYYMM'));
+        CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+
+        -- Rows of this month already in the default partition make CREATE ...
+        -- PARTITION OF fail, so they are taken out and routed back in once the
+        -- partition exists. Deleting submissions cascades to their
+        -- fused_reports, which are saved and restored the same way.
+        has_rows := false;
+        IF to_regclass(default_name) IS NOT NULL THEN
+            EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE created_at >= %L AND created_at < %L)', default_name, range_start, range_end)
+                INTO has_rows;
+        END IF;
+        IF has_rows THEN
+            DROP TABLE IF EXISTS pg_temp.partition_moved_rows, pg_temp.partition_moved_reports;
+            EXECUTE format('CREATE TEMP TABLE partition_moved_rows ON COMMIT DROP AS SELECT * FROM %I WHERE created_at >= %L AND created_at < %L', default_name, range_start, range_end);
+            IF parent = 'submissions'::regclass THEN
+                EXECUTE 'CREATE TEMP TABLE partition_moved_reports ON COMMIT DROP AS SELECT fr.* FROM fused_reports fr JOIN partition_moved_rows m ON fr.submission_id = m.id AND fr.submitted_at = m.created_at';
+            END IF;
+            EXECUTE format('DELETE FROM %I WHERE created_at >= %L AND created_at < %L', default_name, range_start, range_end);
+        END IF;
+
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+            partition_name, parent, range_start, range_end
+        );
+        created := created + 1;
+
+        IF has_rows THEN
+            EXECUTE format('INSERT INTO %s SELECT * FROM partition_moved_rows', parent);
+            IF parent = 'submissions'::regclass THEN
+                EXECUTE 'INSERT INTO fused_reports SELECT * FROM partition_moved_reports';
+            END IF;
+            DROP TABLE pg_temp.partition_moved_rows;
+            DROP TABLE IF EXISTS pg_temp.partition_moved_reports;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Keep the id sequences; they are owned by the old tables and would be dropped with them
+ALTER TABLE fused_reports RENAME TO fused_reports_unpartitioned;
+ALTER TABLE submissions RENAME TO submissions_unpartitioned;
+ALTER TABLE fused_reports_unpartitioned RENAME CONSTRAINT fused_reports_pkey TO fused_reports_unpartitioned_pkey;
+ALTER TABLE submissions_unpartitioned RENAME CONSTRAINT submissions_pkey TO submissions_unpartitioned_pkey;
+ALTER SEQUENCE fused_reports_id_seq OWNED BY NONE;
+ALTER SEQUENCE submissions_id_seq OWNED BY NONE;
+DROP INDEX IF EXISTS idx_fused_reports_created_at_id, idx_fused_reports_location,
+    idx_fused_reports_health_created_at, idx_fused_reports_alerts;
+
+CREATE TABLE submissions (
+    id INTEGER NOT NULL DEFAULT nextval('submissions_id_seq'),
+    user_id INTEGER NOT NULL,
+    original_filename VARCHAR(255) NOT NULL,
+    storage_path VARCHAR(255) NOT NULL,
+    latitude DECIMAL(10, 8),
+    longitude DECIMAL(11, 8),
+    growth_stage VARCHAR(100),
+    status VARCHAR(50) DEFAULT 'RECEIVED',
+    analysis_result_json JSONB,
+    content_hash CHAR(64),
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at),
+    CONSTRAINT fk_user
+        FOREIGN KEY(user_id)
+        REFERENCES users(id)
+        ON DELETE CASCADE
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE fused_reports (
+    id INTEGER NOT NULL DEFAULT nextval('fused_reports_id_seq'),
+    submission_id INTEGER NOT NULL,
+    submitted_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    user_id INTEGER NOT NULL,
+    latitude DECIMAL(10, 8),
+    longitude DECIMAL(11, 8),
+    growth_stage VARCHAR(100),
+    aggregated_analysis JSONB,
+    weather_data JSONB,
+    satellite_data JSONB,
+    final_assessment JSONB,
+    overall_health_score REAL,
+    alert_level VARCHAR(10),
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at),
+    CONSTRAINT fk_submission
+        FOREIGN KEY(submission_id, submitted_at)
+        REFERENCES submissions(id, created_at)
+        ON DELETE CASCADE,
+    CONSTRAINT fk_user_fused
+        FOREIGN KEY(user_id)
+        REFERENCES users(id)
+        ON DELETE CASCADE
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE submissions_id_seq OWNED BY submissions.id;
+ALTER SEQUENCE fused_reports_id_seq OWNED BY fused_reports.id;
+
+CREATE TABLE submissions_default PARTITION OF submissions DEFAULT;
+CREATE TABLE fused_reports_default PARTITION OF fused_reports DEFAULT;
+
+-- Monthly partitions from the oldest existing row through three months ahead
+SELECT ensure_monthly_partitions(
+    parent, first_month,
+    ((date_part('year', age(date_trunc('month', CURRENT_DATE), first_month)) * 12
+      + date_part('month', age(date_trunc('month', CURRENT_DATE), first_month)))::integer + 4)
+)
+FROM (
+    SELECT 'submissions'::regclass AS parent,
+           date_trunc('month', coalesce((SELECT min(created_at) FROM submissions_unpartitioned), now()))::date AS first_month
+    UNION ALL
+    SELECT 'fused_reports'::regclass,
+           date_trunc('month', coalesce((SELECT min(created_at) FROM fused_reports_unpartitioned), now()))::date
+) AS ranges;
+
+INSERT INTO submissions (id, user_id, original_filename, storage_path, latitude, longitude, growth_stage, status, analysis_result_json, content_hash, created_at)
+SELECT id, user_id, original_filename, storage_path, latitude, longitude, growth_stage, status, analysis_result_json, content_hash, coalesce(created_at, now())
+FROM submissions_unpartitioned;
+
+INSERT INTO fused_reports (id, submission_id, submitted_at, user_id, latitude, longitude, growth_stage, aggregated_analysis, weather_data, satellite_data, final_assessment, overall_health_score, alert_level, created_at)
+SELECT fr.id, fr.submission_id, s.created_at, fr.user_id, fr.latitude, fr.longitude, fr.growth_stage, fr.aggregated_analysis, fr.weather_data, fr.satellite_data, fr.final_assessment, fr.overall_health_score, fr.alert_level, coalesce(fr.created_at, now())
+FROM fused_reports_unpartitioned fr
+JOIN submissions s ON s.id = fr.submission_id;
+
+DROP TABLE fused_reports_unpartitioned;
+DROP TABLE submissions_unpartitioned;
+
+CREATE INDEX idx_fused_reports_submission_id ON fused_reports (submission_id);
+CREATE INDEX idx_fused_reports_created_at_id ON fused_reports (created_at DESC, id DESC);
+CREATE INDEX idx_fused_reports_location ON fused_reports USING gist (point(longitude::float8, latitude::float8));
+CREATE INDEX idx_fused_reports_health_created_at ON fused_reports (overall_health_score, created_at DESC);
+CREATE INDEX idx_fused_reports_alerts ON fused_reports (created_at DESC) WHERE overall_health_score < 0.7;
+
+CREATE TABLE IF NOT EXISTS report_daily_rollups (
+    day DATE NOT NULL,
+    crop VARCHAR(100) NOT NULL,
+    disease VARCHAR(100) NOT NULL,
+    region VARCHAR(32) NOT NULL,
+    growth_stage VARCHAR(100) NOT NULL,
+    report_count INTEGER NOT NULL DEFAULT 0,
+    health_score_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    health_score_count INTEGER NOT NULL DEFAULT 0,
+    high_alert_count INTEGER NOT NULL DEFAULT 0,
+    medium_alert_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, crop, disease, region, growth_stage)
+);
+
+-- Backfill; the grouping mirrors common/rollups.py (1 degree region cells)
+TRUNCATE report_daily_rollups;
+INSERT INTO report_daily_rollups
+SELECT (created_at AT TIME ZONE 'UTC')::date AS day,
+       left(coalesce(nullif(aggregated_analysis->'ml_analysis'->>'crop', ''), 'unknown'), 100) AS crop,
+       left(coalesce(nullif(aggregated_analysis->'ml_analysis'->>'disease', ''), 'unknown'), 100) AS disease,
+       CASE WHEN latitude IS NULL OR longitude IS NULL THEN 'unknown'
+            ELSE floor(latitude)::integer || ':' || floor(longitude)::integer END AS region,
+       left(coalesce(nullif(growth_stage, ''), 'unknown'), 100) AS growth_stage,
+       count(*),
+       coalesce(sum(overall_health_score), 0),
+       count(overall_health_score),
+       count(*) FILTER (WHERE alert_level = 'HIGH'),
+       count(*) FILTER (WHERE alert_level = 'MEDIUM')
+FROM fused_reports
+GROUP BY 1, 2, 3, 4, 5;
+
+COMMIT;
@@ -16,6 +16,13 @@ const RABBITMQ_URL = process.env.RABBITMQ_URL || 'amqp://localhost';
 const QUEUE_NAME = 'submission_queue';
 const DLQ_NAME = 'submission_dlq';
 const DLX_NAME = 'submission_dlx';
+// Submissions are spread over SHARD_COUNT shard queues behind a consistent-hash
+// exchange (see common/sharding.py; SHARD_COUNT must match the workers).
+// SHARD_KEY=region keys them by 1-degree grid cell, so one busy region backs
+// up only its own shard; SHARD_KEY=submission spreads them evenly.
+const SHARD_COUNT = parseInt(process.env.SHARD_COUNT || '4', 10);
+const SHARD_KEY = process.env.SHARD_KEY || 'region';
+const SHARD_EXCHANGE = `${QUEUE_NAME}.shards`;
 const SECRET_KEY = process.env.SECRET_KEY || 'your-super-secret-key-that-is-long-and-secure';
 
 // --- RabbitMQ Connection ---
@@ -41,6 +48,14 @@ async function connectRabbitMQ() {
         };
         await channel.assertQueue(QUEUE_NAME, queueArgs);
 
+        // Declare the shard exchange and queues; the binding key is each shard's weight
+        await channel.assertExchange(SHARD_EXCHANGE, 'x-consistent-hash', { durable: true });
+        for (let n = 0; n < SHARD_COUNT; n++) {
+            const shardQueue = `${QUEUE_NAME}.shard.${n}`;
+            await channel.assertQueue(shardQueue, queueArgs);
+            await channel.bindQueue(shardQueue, SHARD_EXCHANGE, '1');
+        }
+
         console.log('Successfully connected to RabbitMQ and queues are asserted.');
     } catch (error) {
         console.error('Failed to connect to RabbitMQ:', error.message);
@@ -139,6 +154,20 @@ app.post('/auth/login', async (req, res) => {
     }
 });
 
+// Falls back to the submission id when the coordinates are not usable, so
+// such submissions spread over the shards instead of all keying to "NaN:NaN"
+function shardKey(submissionId, latitude, longitude) {
+    const lat = Number(latitude);
+    const lon = Number(longitude);
+    const validRegion = latitude !== '' && longitude !== '' &&
+        Number.isFinite(lat) && Number.isFinite(lon) &&
+        lat >= -90 && lat <= 90 && lon >= -180 && lon <= 180;
+    if (SHARD_KEY === 'region' && validRegion) {
+        return `${Math.floor(lat)}:${Math.floor(lon)}`;
+    }
+    return String(submissionId);
+}
+
 // --- Secure Routes ---
 app.post('/ingest', verifyToken, upload.single('cropImage'), async (req, res) => {
     if (!req.file) {
@@ -164,8 +193,11 @@ app.post('/ingest', verifyToken, upload.single('cropImage'), async (req, res) =>
         const submissionId = dbResponse.rows[0].id;
         console.log(`Submission ${submissionId} created in DB for user ${userId}.`);
 
-        const message = { submission_id: submissionId, file_path: filePath };
-        channel.sendToQueue(QUEUE_NAME, Buffer.from(JSON.stringify(message)), { persistent: true });
+        // trace.ingested_at (epoch seconds) lets the workers measure queue wait and end-to-end latency
+        const message = { submission_id: submissionId, file_path: filePath, trace: { ingested_at: Date.now() / 1000 } };
+        // x-shard-key lets tools/replay_dlq.py route replayed messages back to the same shard
+        const key = shardKey(submissionId, latitude, longitude);
+        channel.publish(SHARD_EXCHANGE, key, Buffer.from(JSON.stringify(message)), { persistent: true, headers: { 'x-shard-key': key } });
         console.log(`[x] Sent message for submission ${submissionId} to queue.`);
 
         res.status(202).json({
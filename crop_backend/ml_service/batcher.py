@@ -0,0 +1,153 @@
+import asyncio
+import time
+from collections import deque
+
+
+class DynamicBatcher:
+    """
+    Groups individual inference requests into batches bounded by a maximum
+    size and a maximum wait time, runs each batch once and answers every
+    caller individually. on_batch(queue_waits_s, duration_s), if given, is
+    called after every batch so the caller can export the timings.
+
+    Batches run on executor (the default loop executor if None), with at most
+    max_concurrent_batches in flight; while all are busy, new requests keep
+    accumulating into the next batch. run_batch may put an Exception in an
+    item's slot to fail that caller alone.
+    """
+
+    def __init__(self, run_batch, max_batch_size=16, max_wait_ms=50, stats_window=1024, on_batch=None,
+                 executor=None, max_concurrent_batches=1):
+        self.run_batch = run_batch
+        self.on_batch = on_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor
+        self.max_concurrent_batches = max_concurrent_batches
+        self._queue = None
+        self._slots = None
+        self._runner = None
+        self._in_flight = set()
+
+        # --- Metrics ---
+        self.batches_total = 0
+        self.items_total = 0
+        self.errors_total = 0
+        self.batch_size_counts = {}
+        self._queue_waits_ms = deque(maxlen=stats_window)
+        self._batch_durations_ms = deque(maxlen=stats_window)
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = list(self._in_flight)
+        if self._runner:
+            tasks.append(self._runner)
+            self._runner = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def submit(self, item):
+        """Queues a single item and waits for its individual result."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.monotonic()))
+        return await future
+
+    async def submit_many(self, items):
+        return await asyncio.gather(*(self.submit(item) for item in items), return_exceptions=True)
+
+    async def _collect_batch(self):
+        first = await self._queue.get()
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            # Wait for a free slot before collecting, so requests that arrive
+            # while every slot is busy end up in one larger batch
+            await self._slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except asyncio.CancelledError:
+                self._slots.release()
+                raise
+            task = asyncio.create_task(self._execute(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _execute(self, batch):
+        try:
+            loop = asyncio.get_running_loop()
+            started = time.monotonic()
+            queue_waits = [started - enqueued_at for _, _, enqueued_at in batch]
+            self._queue_waits_ms.extend(wait * 1000 for wait in queue_waits)
+
+            items = [item for item, _, _ in batch]
+            try:
+                # The model call is blocking, keep it off the event loop
+                results = await loop.run_in_executor(self.executor, self.run_batch, items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"Batch returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                self.errors_total += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+
+            duration = time.monotonic() - started
+            self._batch_durations_ms.append(duration * 1000)
+            if self.on_batch:
+                self.on_batch(queue_waits, duration)
+            self.batches_total += 1
+            self.items_total += len(batch)
+            self.batch_size_counts[len(batch)] = self.batch_size_counts.get(len(batch), 0) + 1
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_concurrent_batches": self.max_concurrent_batches,
+            "batches_in_flight": len(self._in_flight),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "batches_total": self.batches_total,
+            "items_total": self.items_total,
+            "errors_total": self.errors_total,
+            "mean_batch_size": self.items_total / self.batches_total if self.batches_total else 0.0,
+            "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+            "queue_wait_ms": _summarize(self._queue_waits_ms),
+            "batch_duration_ms": _summarize(self._batch_durations_ms),
+        }
+
+
+def _summarize(samples):
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3)
+
+    return {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99), "max": round(ordered[-1], 3)}
@@ -1,39 +1,203 @@
-
-import time
-from fastapi import FastAPI
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from typing import List, Optional
+
+from batcher import DynamicBatcher
+from model import load_model
+from preprocess import ImageDecodeError
+from common.metrics import STAGE_SECONDS, instrument_app
+from common.storage import ObjectNotFound, get_storage
 
 app = FastAPI()
+instrument_app(app, 'ml_service')
+
+# --- Configuration ---
+MAX_BATCH_SIZE = int(os.environ.get('ML_MAX_BATCH_SIZE', '16'))
+MAX_BATCH_WAIT_MS = float(os.environ.get('ML_MAX_BATCH_WAIT_MS', '50'))
+
+# Exported by model/export_onnx.py; labels default to the .json next to it.
+# Without a model file the service falls back to mock results.
+MODEL_PATH = os.environ.get('MODEL_PATH', 'model/crop_model.onnx')
+MODEL_LABELS_PATH = os.environ.get('MODEL_LABELS_PATH')
 
+# Identifies the weights behind every result. analysis_worker keys its result
+# cache on it; by default it is derived from the model file.
+MODEL_VERSION = os.environ.get('MODEL_VERSION')
+
+# ML_INFERENCE_MODE=thread: batches run concurrently on ML_INFERENCE_WORKERS
+#   threads sharing one session, each run using ML_INTRA_OP_THREADS ONNX
+#   Runtime threads; keep the product <= CPU cores.
+# ML_INFERENCE_MODE=process: the model is loaded and warmed up once, then
+#   ML_INFERENCE_WORKERS (default: one per core) single-threaded processes are
+#   forked from it and share the weights copy-on-write. Each process decodes
+#   its own images, so there is no GIL contention between batches.
+INFERENCE_MODE = os.environ.get('ML_INFERENCE_MODE', 'thread')
+CPU_COUNT = os.cpu_count() or 1
+if INFERENCE_MODE == 'process':
+    INFERENCE_WORKERS = int(os.environ.get('ML_INFERENCE_WORKERS', str(CPU_COUNT)))
+    # A single intra-op thread means ONNX Runtime starts no thread pool,
+    # which is what makes the loaded session safe to fork
+    INTRA_OP_THREADS = 1
+    DECODE_WORKERS = 0
+else:
+    INFERENCE_WORKERS = int(os.environ.get('ML_INFERENCE_WORKERS', '1'))
+    INTRA_OP_THREADS = int(os.environ.get('ML_INTRA_OP_THREADS', str(max(1, CPU_COUNT // INFERENCE_WORKERS))))
+    DECODE_WORKERS = int(os.environ.get('ML_DECODE_WORKERS', '4'))
+
+# Images are named by a storage_key (see common/storage.py; analysis_worker
+# sends the key of the small inference variant) or, for uploads that were
+# not stored, by a file_path on the shared volume.
 class AnalysisRequest(BaseModel):
-    file_path: str
+    file_path: Optional[str] = None
+    storage_key: Optional[str] = None
+
+class BatchAnalysisRequest(BaseModel):
+    file_paths: List[str] = []
+    storage_keys: List[str] = []
+
+storage = get_storage()
+
+async def read_source(storage_key):
+    """
+    A path the decoder can memory-map for local storage, or the object's
+    bytes for remote storage. Raises ObjectNotFound for a missing object
+    with either backend.
+    """
+    try:
+        path = storage.local_path(storage_key)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if path:
+        if not os.path.isfile(path):
+            raise ObjectNotFound(storage_key)
+        return path
+    return await run_in_threadpool(storage.get_bytes, storage_key)
+
+# --- Model ---
+# Loaded once; shared by all inference threads, or inherited by the forked
+# inference processes
+model = load_model(MODEL_PATH, MODEL_LABELS_PATH, INTRA_OP_THREADS, DECODE_WORKERS, MODEL_VERSION)
+if INFERENCE_MODE == 'process':
+    # Inherited by the forked workers; see fork_inference_workers
+    warm_up_barrier = multiprocessing.get_context('fork').Barrier(INFERENCE_WORKERS)
+    inference_executor = ProcessPoolExecutor(max_workers=INFERENCE_WORKERS, mp_context=multiprocessing.get_context('fork'))
+else:
+    inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix='inference')
+
+def run_model_batch(sources):
+    """
+    Runs a single model pass over a batch of images (paths or bytes) and
+    returns one analysis per image, in order (an ImageDecodeError for
+    images that cannot be read).
+    """
+    print(f"Running model on batch of {len(sources)} image(s)")
+    return model.predict(sources)
+
+def wait_for_all_workers(timeout_s=60):
+    """Runs in an inference process; returns once every process has reached it."""
+    warm_up_barrier.wait(timeout_s)
+    return os.getpid()
 
+async def fork_inference_workers():
+    """
+    Makes the process pool fork all INFERENCE_WORKERS processes now. The
+    pool forks on demand, so INFERENCE_WORKERS quick tasks may all run on
+    the first process; these tasks block until every process holds one.
+    """
+    loop = asyncio.get_running_loop()
+    pids = await asyncio.gather(*(loop.run_in_executor(inference_executor, wait_for_all_workers) for _ in range(INFERENCE_WORKERS)))
+    print(f"Forked {len(set(pids))} inference process(es).")
+
+def observe_batch(queue_waits, duration):
+    for wait in queue_waits:
+        STAGE_SECONDS.labels('ml_service', 'batch_queue_wait').observe(wait)
+    STAGE_SECONDS.labels('ml_service', 'inference').observe(duration)
+
+batcher = DynamicBatcher(
+    run_model_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_BATCH_WAIT_MS, on_batch=observe_batch,
+    executor=inference_executor, max_concurrent_batches=INFERENCE_WORKERS
+)
+
+@app.on_event("startup")
+async def start_batcher():
+    # Warm up with the batch sizes we expect, so the first real requests do
+    # not pay for graph optimization and allocation
+    loop = asyncio.get_running_loop()
+    warm_up_sizes = sorted({1, MAX_BATCH_SIZE})
+    if INFERENCE_MODE == 'process':
+        # Warm up before forking so the children inherit the initialized session
+        model.warm_up(warm_up_sizes)
+        await fork_inference_workers()
+    else:
+        await loop.run_in_executor(inference_executor, model.warm_up, warm_up_sizes)
+    await batcher.start()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await batcher.stop()
+    inference_executor.shutdown(wait=False)
+
+# --- Routes ---
 @app.post("/analyze")
-def analyze(request: AnalysisRequest):
-    """
-    Accepts a file path, simulates a delay, and returns a mock analysis.
-    """
-    print(f"Received request to analyze: {request.file_path}")
-    
-    # Simulate ML model processing time
-    time.sleep(2)
-    
-    # Return a hardcoded mock result
-    mock_result = {
-        "crop": "tomato",
-        "disease": "Late Blight",
-        "confidence": 0.88,
-        "suggestions": [
-            "Apply a fungicide containing mancozeb or chlorothalonil.",
-            "Ensure proper spacing between plants for better air circulation.",
-            "Remove and destroy infected plant debris."
-        ]
+async def analyze(request: AnalysisRequest):
+    """
+    Accepts a storage key or file path, queues the image on the dynamic
+    batcher and returns its analysis once the batch it was grouped into has
+    run.
+    """
+    if not (request.storage_key or request.file_path):
+        raise HTTPException(status_code=422, detail="storage_key or file_path is required")
+    print(f"Received request to analyze: {request.storage_key or request.file_path}")
+    try:
+        source = await read_source(request.storage_key) if request.storage_key else request.file_path
+        result = await batcher.submit(source)
+    except ObjectNotFound as e:
+        raise HTTPException(status_code=422, detail=f"No stored image {e}")
+    except ImageDecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    print(f"Returning analysis: {result}")
+    return result
+
+@app.post("/analyze/batch")
+async def analyze_batch(request: BatchAnalysisRequest):
+    """
+    Accepts many file paths and/or storage keys at once; results list the
+    file paths first, then the keys. They go through the same batcher as
+    single requests, so they may share model passes with concurrent calls.
+    """
+    sources = list(request.file_paths)
+    try:
+        sources += await asyncio.gather(*(read_source(key) for key in request.storage_keys))
+    except ObjectNotFound as e:
+        raise HTTPException(status_code=422, detail=f"No stored image {e}")
+    print(f"Received batch request to analyze {len(sources)} image(s)")
+    results = await batcher.submit_many(sources)
+    for result in results:
+        if isinstance(result, Exception) and not isinstance(result, ImageDecodeError):
+            raise result
+    return {"results": [
+        {"error": str(result)} if isinstance(result, Exception) else result
+        for result in results
+    ]}
+
+@app.get("/model")
+def model_info():
+    return {
+        **model.info(),
+        "inference_mode": INFERENCE_MODE,
+        "inference_workers": INFERENCE_WORKERS,
+        "intra_op_threads": INTRA_OP_THREADS,
     }
-    
-    print(f"Returning analysis: {mock_result}")
-    return mock_result
+
+@app.get("/batcher/stats")
+def batcher_stats():
+    return batcher.stats()
 
 @app.get("/")
 def health_check():
     return {"status": "ML service is running"}
-
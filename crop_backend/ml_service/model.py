@@ -0,0 +1,193 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from common.model_version import file_version
+from preprocess import IMAGENET_MEAN, IMAGENET_STD, ImageDecodeError, load_image, to_tensor
+
+SUGGESTIONS = {
+    "healthy": [
+        "No visible damage. Continue regular monitoring."
+    ],
+    "mild": [
+        "Monitor the affected plants closely over the next few days.",
+        "Remove visibly damaged leaves to limit spread."
+    ],
+    "moderate": [
+        "Inspect neighbouring plants for the same symptoms.",
+        "Consult the local agriculture officer about treatment options."
+    ],
+    "severe": [
+        "Isolate or remove badly damaged plants.",
+        "Report the damage to the local agriculture officer for assessment."
+    ],
+}
+
+
+def softmax(logits):
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+def sigmoid(logits):
+    return 1.0 / (1.0 + np.exp(-logits))
+
+
+class OnnxCropModel:
+    """
+    The multi-head classifier from model/ exported to ONNX (model/export_onnx.py)
+    and served with ONNX Runtime on CPU. The session is created once and is
+    safe to call from several threads; intra_op_threads bounds the threads
+    each run uses so concurrent batches do not oversubscribe the CPU.
+    """
+
+    def __init__(self, model_path, labels_path, intra_op_threads=1, decode_workers=4, version=None):
+        import onnxruntime as ort
+
+        with open(labels_path) as f:
+            self.labels = json.load(f)
+        self.img_size = int(self.labels.get("img_size", 224))
+        self.mean = np.array(self.labels.get("mean", IMAGENET_MEAN), dtype=np.float32)
+        self.std = np.array(self.labels.get("std", IMAGENET_STD), dtype=np.float32)
+        self.version = version or self.labels.get("model_version") or file_version(model_path)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_names = [output.name for output in self.session.get_outputs()]
+        self.intra_op_threads = intra_op_threads
+
+        # PIL releases the GIL while decoding and resizing. With no decode
+        # workers (process mode) images are decoded on the calling thread.
+        self.decode_pool = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix='decode') if decode_workers else None
+
+    def info(self):
+        return {
+            "model_version": self.version,
+            "backend": "onnxruntime",
+            "quantization": self.labels.get("quantization", "fp32"),
+            "img_size": self.img_size,
+            "intra_op_threads": self.intra_op_threads,
+            "classes": {
+                "crop": self.labels["crop"],
+                "growth_stage": self.labels["growth_stage"],
+                "severity_level": self.labels["severity_level"],
+            },
+        }
+
+    def warm_up(self, batch_sizes=(1,)):
+        """Runs dummy batches so the first real request does not pay for graph setup and allocation."""
+        for batch_size in batch_sizes:
+            self.run(np.zeros((batch_size, 3, self.img_size, self.img_size), dtype=np.float32))
+
+    def run(self, batch):
+        return dict(zip(self.output_names, self.session.run(None, {self.input_name: batch})))
+
+    def predict(self, sources):
+        """
+        Returns one result per source (file path or image bytes), in order.
+        Sources that cannot be decoded get an ImageDecodeError in their slot
+        instead of failing the batch.
+        """
+        if self.decode_pool:
+            decoded = list(self.decode_pool.map(self._decode, sources))
+        else:
+            decoded = [self._decode(source) for source in sources]
+        images = [image for image in decoded if not isinstance(image, Exception)]
+        if not images:
+            return decoded
+
+        outputs = self.run(to_tensor(images, self.mean, self.std))
+        crop = softmax(outputs["crop"])
+        growth = softmax(outputs["growth"])
+        severity = softmax(outputs["severity"])
+        damaged = sigmoid(outputs["is_damaged"].reshape(-1))
+        health = np.clip(outputs["health"].reshape(-1) * 100.0, 0.0, 100.0)
+
+        results = []
+        row = 0
+        for image in decoded:
+            if isinstance(image, Exception):
+                results.append(image)
+                continue
+            results.append(self._result(crop[row], growth[row], severity[row], damaged[row], health[row]))
+            row += 1
+        return results
+
+    def _decode(self, source):
+        try:
+            return load_image(source, self.img_size)
+        except ImageDecodeError as e:
+            return e
+
+    def _result(self, crop, growth, severity, damaged, health):
+        crop_name = self.labels["crop"][int(crop.argmax())]
+        severity_level = self.labels["severity_level"][int(severity.argmax())]
+        is_damaged = bool(damaged > 0.5)
+        return {
+            "model_version": self.version,
+            "crop": crop_name,
+            "confidence": float(crop.max()),
+            "disease": f"{severity_level.capitalize()} damage" if is_damaged else "Healthy",
+            "is_damaged": is_damaged,
+            "is_damaged_prob": float(damaged),
+            "growth_stage": self.labels["growth_stage"][int(growth.argmax())],
+            "severity_level": severity_level,
+            "health_score": round(float(health), 2),
+            "probabilities": {
+                "crop": dict(zip(self.labels["crop"], crop.round(4).tolist())),
+                "growth_stage": dict(zip(self.labels["growth_stage"], growth.round(4).tolist())),
+                "severity_level": dict(zip(self.labels["severity_level"], severity.round(4).tolist())),
+            },
+            "suggestions": SUGGESTIONS.get(severity_level, []),
+        }
+
+
+class MockCropModel:
+    """Stand-in used when no exported model is available (local development)."""
+
+    def __init__(self, version=None, latency_s=2.0):
+        self.version = version or "mock-1"
+        self.latency_s = latency_s
+
+    def info(self):
+        return {"model_version": self.version, "backend": "mock"}
+
+    def warm_up(self, batch_sizes=(1,)):
+        pass
+
+    def predict(self, sources):
+        # Simulate ML model processing time (one pass per batch, not per file)
+        time.sleep(self.latency_s)
+        return [
+            {
+                "model_version": self.version,
+                "crop": "tomato",
+                "disease": "Late Blight",
+                "confidence": 0.88,
+                "suggestions": [
+                    "Apply a fungicide containing mancozeb or chlorothalonil.",
+                    "Ensure proper spacing between plants for better air circulation.",
+                    "Remove and destroy infected plant debris."
+                ]
+            }
+            for _ in sources
+        ]
+
+
+def load_model(model_path, labels_path=None, intra_op_threads=1, decode_workers=4, version=None):
+    """Loads the exported model, or falls back to the mock if it is not there."""
+    labels_path = labels_path or os.path.splitext(model_path)[0] + '.json'
+    if not (os.path.exists(model_path) and os.path.exists(labels_path)):
+        print(f"No model at {model_path} (labels {labels_path}); serving mock results.")
+        return MockCropModel(version)
+
+    print(f"Loading model from {model_path} (intra_op_threads={intra_op_threads})")
+    return OnnxCropModel(model_path, labels_path, intra_op_threads, decode_workers, version)
@@ -0,0 +1,48 @@
+import io
+import mmap
+
+import numpy as np
+from PIL import Image
+
+from common.image_variants import model_input
+
+# Same input pipeline as the notebook's val_transforms:
+# Resize((224, 224)) -> ToTensor() -> Normalize(ImageNet mean/std)
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+class ImageDecodeError(Exception):
+    """Raised when an upload cannot be read or decoded as an image."""
+
+
+def load_image(source, size):
+    """
+    Decodes one image into a (size, size, 3) uint8 array. source is a file
+    path, which is memory-mapped rather than read into a bytes copy, or the
+    encoded bytes of an image fetched from remote storage, such as the
+    inference variant analysis_worker stores. JPEGs are downscaled during
+    decode (draft mode) before the exact resize.
+    """
+    try:
+        if isinstance(source, (bytes, bytearray)):
+            return decode(io.BytesIO(source), size)
+        with open(source, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return decode(mm, size)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        # ValueError covers mmap of an empty file
+        name = f"{len(source)}-byte image" if isinstance(source, (bytes, bytearray)) else source
+        raise ImageDecodeError(f"Cannot decode {name}: {e}") from e
+
+
+def decode(stream, size):
+    return np.asarray(model_input(Image.open(stream), size), dtype=np.uint8)
+
+
+def to_tensor(images, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+    """Stacks HWC uint8 images into one normalized NCHW float32 batch."""
+    batch = np.stack(images).astype(np.float32)
+    batch *= 1.0 / 255.0
+    batch -= mean
+    batch /= std
+    return np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Services import their own modules top-level (from batcher import ...,
+# from cache import ...) and the shared package as common.*, the way their
+# Dockerfiles lay them out
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ('ml_service', 'data_fusion_worker', 'dashboard_api', ''):
+    path = os.path.join(BACKEND_ROOT, directory) if directory else BACKEND_ROOT
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,32 @@
+import os
+import re
+
+import pytest
+
+from common.assessment import ALERT_HEALTH_THRESHOLD, alert_level_for
+
+DB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db')
+ALERTS_INDEX_RE = re.compile(r"idx_fused_reports_alerts\s+ON\s+fused_reports\b[^;]*?WHERE\s+overall_health_score\s*<\s*([0-9.]+)", re.S)
+
+
+@pytest.mark.parametrize("score, level", [(None, None), (0.0, 'HIGH'), (0.49, 'HIGH'), (0.5, 'MEDIUM'), (0.69, 'MEDIUM'), (0.7, 'LOW'), (1.0, 'LOW')])
+def test_alert_levels(score, level):
+    assert alert_level_for(score) == level
+
+
+def sql_files():
+    yield os.path.join(DB_DIR, 'init.sql')
+    migrations = os.path.join(DB_DIR, 'migrations')
+    for name in sorted(os.listdir(migrations)):
+        yield os.path.join(migrations, name)
+
+
+def test_alerts_index_predicate_matches_the_threshold():
+    thresholds = {}
+    for path in sql_files():
+        with open(path) as f:
+            for threshold in ALERTS_INDEX_RE.findall(f.read()):
+                thresholds[os.path.basename(path)] = float(threshold)
+
+    assert 'init.sql' in thresholds
+    assert thresholds == {name: ALERT_HEALTH_THRESHOLD for name in thresholds}
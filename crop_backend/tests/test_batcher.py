@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from batcher import DynamicBatcher
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def with_batcher(run_batch, body, **kwargs):
+    batcher = DynamicBatcher(run_batch, **kwargs)
+    await batcher.start()
+    try:
+        return await body(batcher)
+    finally:
+        await batcher.stop()
+
+
+def test_groups_concurrent_requests_up_to_max_batch_size():
+    seen = []
+
+    def run_batch(items):
+        seen.append(list(items))
+        return [item * 2 for item in items]
+
+    results = run(with_batcher(run_batch, lambda b: b.submit_many(range(10)), max_batch_size=4, max_wait_ms=200))
+
+    assert results == [item * 2 for item in range(10)]
+    assert [len(batch) for batch in seen] == [4, 4, 2]
+
+
+def test_lone_request_runs_after_max_wait():
+    async def body(batcher):
+        return await asyncio.wait_for(batcher.submit('x'), timeout=1)
+
+    assert run(with_batcher(lambda items: items, body, max_batch_size=8, max_wait_ms=10)) == 'x'
+
+
+def test_batch_failure_fails_every_caller():
+    def run_batch(items):
+        raise RuntimeError("model down")
+
+    async def body(batcher):
+        results = await batcher.submit_many([1, 2, 3])
+        return results, batcher.stats()
+
+    results, stats = run(with_batcher(run_batch, body, max_wait_ms=50))
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert stats["errors_total"] == 1
+    assert stats["items_total"] == 3
+
+
+def test_exception_in_slot_fails_only_that_caller():
+    def run_batch(items):
+        return [ValueError(item) if item == 'bad' else item for item in items]
+
+    results = run(with_batcher(run_batch, lambda b: b.submit_many(['a', 'bad', 'c']), max_wait_ms=50))
+
+    assert results[0] == 'a' and results[2] == 'c'
+    assert isinstance(results[1], ValueError)
+
+
+def test_result_count_mismatch_is_an_error():
+    async def body(batcher):
+        with pytest.raises(RuntimeError, match="2 items"):
+            await asyncio.gather(batcher.submit(1), batcher.submit(2))
+
+    run(with_batcher(lambda items: items[:1], body, max_wait_ms=50))
+
+
+def test_on_batch_reports_timings():
+    calls = []
+
+    run(with_batcher(
+        lambda items: items, lambda b: b.submit_many([1, 2]),
+        max_wait_ms=50, on_batch=lambda waits, duration: calls.append((len(waits), duration))
+    ))
+
+    assert len(calls) == 1
+    assert calls[0][0] == 2 and calls[0][1] >= 0
@@ -0,0 +1,58 @@
+import pytest
+
+from common.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+def test_opens_after_consecutive_failures():
+    opened = []
+    breaker = CircuitBreaker('test', failure_threshold=3, on_open=lambda: opened.append(1))
+
+    assert breaker.record_failure() is False
+    assert breaker.record_failure() is False
+    assert breaker.record_failure() is True
+    assert breaker.is_open and not breaker.allow()
+    assert opened == [1]
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker('test', failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert not breaker.is_open
+
+
+def test_failures_while_open_do_not_reopen():
+    opened = []
+    breaker = CircuitBreaker('test', failure_threshold=1, on_open=lambda: opened.append(1))
+    breaker.record_failure()
+
+    assert breaker.record_failure() is False
+    assert opened == [1]
+
+
+def test_failed_probes_back_off_up_to_the_max():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout_s=10, max_reset_timeout_s=35)
+    breaker.record_failure()
+
+    delays = []
+    for _ in range(4):
+        delays.append(breaker.retry_after())
+        breaker.probe_failed()
+    assert delays == [10, 20, 35, 35]
+
+
+def test_close_resets_state():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout_s=10)
+    breaker.record_failure()
+    breaker.probe_failed()
+    breaker.close()
+
+    assert breaker.allow()
+    assert breaker.retry_after() == 10
+    assert breaker.stats() == {
+        "name": "test", "state": "closed", "consecutive_failures": 0, "failed_probes": 0, "times_opened": 1,
+    }
@@ -0,0 +1,30 @@
+import datetime
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('asyncpg')
+pytest.importorskip('prometheus_client')
+
+from fastapi import HTTPException
+
+from main import decode_cursor, encode_cursor
+
+
+def test_round_trip():
+    created_at = datetime.datetime(2025, 3, 1, 12, 30, 5, 123456, tzinfo=datetime.timezone.utc)
+
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(datetime.datetime(2025, 3, 1, tzinfo=datetime.timezone.utc), 2 ** 40)
+
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm9waXBl", "MjAyNS0wMy0wMXxhYmM=", "//79"])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
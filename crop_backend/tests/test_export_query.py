@@ -0,0 +1,43 @@
+import datetime
+
+import pytest
+
+pytest.importorskip('fastapi')
+
+from export import build_export_query, export_columns
+
+
+def test_no_filters():
+    query, params = build_export_query('summary')
+
+    assert params == []
+    assert " WHERE " not in query
+    assert query.endswith(" ORDER BY fr.created_at, fr.id")
+    assert "aggregated_analysis AS aggregated_analysis" not in query
+
+
+def test_full_adds_the_json_columns():
+    query, _ = build_export_query('full')
+
+    assert "fr.aggregated_analysis AS aggregated_analysis" in query
+    assert len(export_columns('full')) > len(export_columns('summary'))
+
+
+def test_dates_are_an_inclusive_utc_range():
+    query, params = build_export_query('summary', start=datetime.date(2025, 1, 1), end=datetime.date(2025, 1, 31))
+
+    assert "fr.created_at >= $1 AND fr.created_at < $2" in query
+    assert params == [
+        datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc),
+        datetime.datetime(2025, 2, 1, tzinfo=datetime.timezone.utc),
+    ]
+
+
+def test_params_are_numbered_in_order():
+    query, params = build_export_query(
+        'summary', bbox=[77.0, 12.0, 78.0, 13.0], min_health_score=0.2, max_health_score=0.8, alert_level='high'
+    )
+
+    assert "box(point($1, $2), point($3, $4))" in query
+    assert "fr.overall_health_score >= $5 AND fr.overall_health_score <= $6 AND fr.alert_level = $7" in query
+    assert params == [77.0, 12.0, 78.0, 13.0, 0.2, 0.8, 'high']
@@ -0,0 +1,229 @@
+import datetime
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip('pika')
+pytest.importorskip('psycopg2')
+pytest.importorskip('prometheus_client')
+
+import worker
+
+SUBMITTED_AT = datetime.datetime(2025, 3, 1, tzinfo=datetime.timezone.utc)
+ANALYSIS = {"crop": "wheat", "disease": "rust", "confidence": 0.9}
+
+
+class FakeDatabase:
+    """In-memory stand-in for the tables fuse_batch reads and writes, behind the pool interface."""
+
+    def __init__(self, *submission_ids, fused=()):
+        self.submissions = {
+            submission_id: [submission_id, 7, 12.5, 77.5, 'vegetative', ANALYSIS, SUBMITTED_AT, 'COMPLETED']
+            for submission_id in submission_ids
+        }
+        self.reports = {submission_id: None for submission_id in fused}
+        self.in_use = 0
+        self.locked = []
+        self.commits = 0
+        self.on_read = None
+
+    @contextmanager
+    def connection(self):
+        self.in_use += 1
+        try:
+            yield FakeConnection(self)
+        finally:
+            self.in_use -= 1
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+        self.reports = {}
+        self.statuses = {}
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.db.reports.update(self.reports)
+        for submission_id, status in self.statuses.items():
+            self.db.submissions[submission_id][7] = status
+        self.db.commits += 1
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+
+    def execute(self, query, params):
+        db = self.conn.db
+        if query.startswith(worker.SUBMISSIONS_QUERY):
+            ids = params[0]
+            if 'FOR UPDATE' in query:
+                db.locked.append(sorted(ids))
+            elif db.on_read:
+                db.on_read()
+            self.rows = [
+                tuple(row[:7]) + (row[7] == 'FUSED' or submission_id in db.reports,)
+                for submission_id, row in sorted(db.submissions.items()) if submission_id in ids
+            ]
+        elif query.startswith('UPDATE submissions'):
+            for submission_id in params[1]:
+                self.conn.statuses[submission_id] = params[0]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+def fake_execute_values(cur, query, rows, fetch=False):
+    if 'INSERT INTO fused_reports' in query:
+        for row in rows:
+            cur.conn.reports[row[0]] = row
+        return [(row[0], row[3], row[4], row[10], row[11], SUBMITTED_AT.date()) for row in rows]
+
+
+class FakeEnricher:
+    def __init__(self, db=None, error=None):
+        self.db = db
+        self.error = error
+        self.connections_in_use = []
+
+    def enrich_async(self, latitude, longitude, growth_stage):
+        if self.db is not None:
+            self.connections_in_use.append(self.db.in_use)
+        weather, satellite = Future(), Future()
+        if self.error:
+            weather.set_exception(self.error)
+        else:
+            weather.set_result({"temperature_c": 28})
+        satellite.set_result({"ndvi": 0.7})
+        return weather, satellite
+
+    def stats(self):
+        return {}
+
+
+@pytest.fixture
+def fusion(monkeypatch):
+    def setup(db, enricher=None):
+        monkeypatch.setattr(worker, 'db_pool', db)
+        monkeypatch.setattr(worker, 'execute_values', fake_execute_values)
+        monkeypatch.setattr(worker, 'enricher', enricher or FakeEnricher(db))
+        return db
+    return setup
+
+
+def test_fuses_a_batch_in_one_transaction(fusion):
+    db = fusion(FakeDatabase(1, 2, 3))
+
+    assert worker.fuse_batch({1, 2, 3}) == set()
+    assert sorted(db.reports) == [1, 2, 3]
+    assert db.locked == [[1, 2, 3]]
+    assert db.commits == 1
+    assert all(row[7] == 'FUSED' for row in db.submissions.values())
+
+
+def test_enrichment_runs_without_a_connection(fusion):
+    enricher = FakeEnricher()
+    db = fusion(FakeDatabase(1, 2), enricher)
+    enricher.db = db
+
+    worker.fuse_batch({1, 2})
+
+    assert enricher.connections_in_use == [0, 0]
+
+
+def test_missing_submissions_fail_and_fused_ones_are_skipped(fusion):
+    db = fusion(FakeDatabase(1, 2, fused=[2]))
+
+    assert worker.fuse_batch({1, 2, 3}) == {3}
+    assert db.locked == [[1]]
+
+
+def test_report_written_while_enriching_is_not_duplicated(fusion):
+    db = fusion(FakeDatabase(1, 2))
+
+    def concurrent_fusion():
+        db.reports[2] = None
+    db.on_read = concurrent_fusion
+
+    assert worker.fuse_batch({1, 2}) == set()
+    assert db.reports[1] is not None and db.reports[2] is None
+
+
+def test_failed_enrichment_fails_the_submission_without_a_transaction(fusion):
+    db = fusion(FakeDatabase(1), FakeEnricher(error=RuntimeError("weather down")))
+
+    assert worker.fuse_batch({1}) == {1}
+    assert db.locked == [] and db.commits == 0
+
+
+class FakeChannel:
+    def __init__(self):
+        self.acks = []
+        self.nacks = []
+        self.published = []
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.acks.append((delivery_tag, multiple))
+
+    def basic_nack(self, delivery_tag, requeue):
+        self.nacks.append(delivery_tag)
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append(routing_key)
+
+
+def buffered(consumer, *submission_ids, max_attempts=1):
+    retry_policy = worker.RetryPolicy('fusion_queue', base_delay_s=1, max_attempts=max_attempts)
+    for tag, submission_id in enumerate(submission_ids, start=1):
+        consumer.pending.append((tag, submission_id, None, None, b'{}', retry_policy))
+
+
+def test_flush_retries_failures_before_acking_the_rest(monkeypatch):
+    channel = FakeChannel()
+    consumer = worker.BatchConsumer(None, channel)
+    monkeypatch.setattr(worker, 'fuse_batch', lambda ids: {2})
+    buffered(consumer, 1, 2, 3)
+
+    consumer.flush()
+
+    assert channel.published == ['fusion_queue.retry.1000ms']
+    assert channel.acks == [(2, False), (3, True)]
+
+
+def test_flush_dead_letters_failures_out_of_retries(monkeypatch):
+    channel = FakeChannel()
+    consumer = worker.BatchConsumer(None, channel)
+    monkeypatch.setattr(worker, 'fuse_batch', lambda ids: {1})
+    buffered(consumer, 1, 2, max_attempts=0)
+
+    consumer.flush()
+
+    assert channel.nacks == [1]
+    assert channel.acks == [(2, True)]
+
+
+def test_flush_settles_individually_when_the_batch_fails(monkeypatch):
+    channel = FakeChannel()
+    consumer = worker.BatchConsumer(None, channel)
+
+    def fuse_batch(ids):
+        if len(ids) > 1:
+            raise RuntimeError("deadlock")
+        if ids == {2}:
+            raise RuntimeError("bad row")
+        return set()
+    monkeypatch.setattr(worker, 'fuse_batch', fuse_batch)
+    buffered(consumer, 1, 2)
+
+    consumer.flush()
+
+    assert channel.acks == [(1, False), (2, False)]
+    assert channel.published == ['fusion_queue.retry.1000ms']
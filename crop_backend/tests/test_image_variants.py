@@ -0,0 +1,49 @@
+import io
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+ImageDraw = pytest.importorskip('PIL.ImageDraw')
+np = pytest.importorskip('numpy')
+
+from common.image_variants import VariantError, make_variants
+from preprocess import load_image
+
+
+@pytest.fixture
+def upload(tmp_path):
+    image = Image.new('RGB', (1024, 768), (40, 120, 30))
+    draw = ImageDraw.Draw(image)
+    for n in range(12):
+        draw.ellipse((n * 70, n * 40, n * 70 + 200, n * 40 + 150), fill=(20 * n, 255 - 15 * n, 90))
+    path = tmp_path / 'upload.jpg'
+    image.save(path, format='JPEG', quality=90)
+    return str(path)
+
+
+def test_inference_variant_matches_preprocessing_of_the_original(upload):
+    variants = make_variants(upload, inference_size=224)
+
+    assert np.array_equal(load_image(variants["inference"], 224), load_image(upload, 224))
+
+
+def test_inference_variant_is_lossless_at_model_size(upload):
+    inference = Image.open(io.BytesIO(make_variants(upload, inference_size=224)["inference"]))
+
+    assert inference.format == 'PNG'
+    assert inference.size == (224, 224)
+
+
+def test_thumbnail_keeps_the_aspect_ratio(upload):
+    thumbnail = Image.open(io.BytesIO(make_variants(upload, thumbnail_edge=256)["thumbnail"]))
+
+    assert thumbnail.format == 'JPEG'
+    assert thumbnail.size == (256, 192)
+
+
+def test_undecodable_upload(tmp_path):
+    for name, data in (('empty.jpg', b''), ('text.jpg', b'not an image')):
+        path = tmp_path / name
+        path.write_bytes(data)
+        with pytest.raises(VariantError):
+            make_variants(str(path))
@@ -0,0 +1,95 @@
+import asyncio
+import math
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('asyncpg')
+pytest.importorskip('prometheus_client')
+
+from fastapi import HTTPException
+
+import main
+from main import MAP_MAX_CELLS, MAP_MAX_CELLS_PER_AXIS, cell_size_for_bbox, cell_size_for_zoom, tile_bbox
+
+
+def test_cell_size_halves_per_zoom_level():
+    assert cell_size_for_zoom(0) == 90.0
+    assert cell_size_for_zoom(5) == pytest.approx(cell_size_for_zoom(4) / 2)
+
+
+def test_small_bbox_keeps_the_zoom_cell_size():
+    assert cell_size_for_bbox([77.0, 12.0, 77.5, 12.5], 10) == cell_size_for_zoom(10)
+
+
+def test_large_bbox_for_its_zoom_gets_coarser_cells():
+    bbox = [-180.0, -90.0, 180.0, 90.0]
+    cell = cell_size_for_bbox(bbox, 22)
+
+    assert cell == 360.0 / MAP_MAX_CELLS_PER_AXIS
+    assert 360.0 / cell <= MAP_MAX_CELLS_PER_AXIS
+
+
+def test_tile_bbox_of_the_world_tile():
+    min_lon, min_lat, max_lon, max_lat = tile_bbox(0, 0, 0)
+
+    assert (min_lon, max_lon) == (-180.0, 180.0)
+    assert min_lat == pytest.approx(-85.0511, abs=1e-4)
+    assert max_lat == pytest.approx(85.0511, abs=1e-4)
+
+
+def test_tile_bbox_quadrant():
+    assert tile_bbox(1, 1, 0)[:1] + tile_bbox(1, 1, 0)[2:3] == [0.0, 180.0]
+    assert tile_bbox(1, 1, 0)[1] == pytest.approx(0.0, abs=1e-9)
+
+
+def test_tile_bbox_rejects_out_of_range_tiles():
+    with pytest.raises(HTTPException):
+        tile_bbox(2, 4, 0)
+
+
+@pytest.mark.parametrize("bbox, zoom", [
+    ([-180.0, -90.0, 180.0, 90.0], 22),
+    ([77.0137, 12.0071, 79.0219, 13.3313], 14),
+    ([-0.3, 51.1, 0.2, 51.7], 3),
+])
+def test_unaligned_bbox_stays_within_the_cell_cap(bbox, zoom):
+    cell = cell_size_for_bbox(bbox, zoom)
+    min_lon, min_lat, max_lon, max_lat = bbox
+    columns = math.floor(max_lon / cell) - math.floor(min_lon / cell) + 1
+    rows = math.floor(max_lat / cell) - math.floor(min_lat / cell) + 1
+
+    assert columns * rows <= MAP_MAX_CELLS
+
+
+class FakePool:
+    def __init__(self, rows):
+        self.rows = rows
+        self.args = None
+
+    async def fetch(self, query, *args):
+        self.args = args
+        return self.rows[:args[-1]]
+
+
+def test_clusters_come_from_whole_cells(monkeypatch):
+    pool = FakePool([(3, 231.0, 37.5, 1.5, 2, 11, {"FUSED": 2, "FAILED": 1}), (1, 77.2, 12.3, None, 0, 40, {"FUSED": 1})])
+    monkeypatch.setattr(main, 'db_pool', pool)
+
+    response = asyncio.run(main.cluster_reports([77.0, 12.0, 78.0, 13.0], 10))
+
+    assert response["truncated"] is False
+    assert response["clusters"][0] == {
+        "latitude": 12.5, "longitude": 77.0, "count": 3, "mean_health_score": 0.75,
+        "status_counts": {"FUSED": 2, "FAILED": 1}, "submission_id": None,
+    }
+    assert response["clusters"][1]["submission_id"] == 40
+
+
+def test_cell_cap_sets_truncated(monkeypatch):
+    monkeypatch.setattr(main, 'db_pool', FakePool([(1, 77.0, 12.0, None, 0, n, {"FUSED": 1}) for n in range(MAP_MAX_CELLS + 5)]))
+
+    response = asyncio.run(main.cluster_reports([77.0, 12.0, 78.0, 13.0], 10))
+
+    assert response["truncated"] is True
+    assert len(response["clusters"]) == MAP_MAX_CELLS
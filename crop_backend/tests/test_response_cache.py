@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip('asyncpg')
+
+from cache import ResponseCache
+
+
+def region_is(region):
+    return lambda event: event["region"] == region
+
+
+def test_invalidate_evicts_only_matching_entries():
+    cache = ResponseCache(ttl_s=60)
+    cache.set('north', b'n', invalidate_when=region_is('north'))
+    cache.set('south', b's', invalidate_when=region_is('south'))
+
+    assert cache.invalidate({"region": "north"}) == 1
+    assert cache.get('north') is None
+    assert cache.get('south').body == b's'
+
+
+def test_response_read_before_a_matching_event_is_not_stored():
+    cache = ResponseCache(ttl_s=60)
+    generation = cache.generation
+    cache.invalidate({"region": "north"})
+
+    cache.set('north', b'n', invalidate_when=region_is('north'), generation=generation)
+
+    assert cache.get('north') is None
+    assert cache.stats()["stale_sets"] == 1
+
+
+def test_unrelated_events_do_not_block_the_store():
+    cache = ResponseCache(ttl_s=60)
+    generation = cache.generation
+    cache.invalidate({"region": "south"})
+
+    cache.set('north', b'n', invalidate_when=region_is('north'), generation=generation)
+
+    assert cache.get('north').body == b'n'
+
+
+def test_flush_blocks_every_older_response():
+    cache = ResponseCache(ttl_s=60)
+    generation = cache.generation
+    cache.clear()
+
+    cache.set('north', b'n', invalidate_when=region_is('north'), generation=generation)
+
+    assert cache.get('north') is None
+
+
+def test_forgotten_history_is_treated_as_stale():
+    cache = ResponseCache(ttl_s=60)
+    generation = cache.generation
+    for _ in range(cache._recent.maxlen + 1):
+        cache.invalidate({"region": "south"})
+
+    cache.set('north', b'n', invalidate_when=region_is('north'), generation=generation)
+
+    assert cache.get('north') is None
@@ -0,0 +1,59 @@
+import pytest
+
+pika = pytest.importorskip('pika')
+
+from common.retry import ATTEMPT_HEADER, RetryPolicy, attempt_of
+
+
+class RecordingChannel:
+    def __init__(self):
+        self.declared = []
+        self.published = []
+
+    def queue_declare(self, queue, durable, arguments):
+        self.declared.append((queue, arguments))
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append((routing_key, body, properties))
+
+
+def test_delays_grow_by_the_backoff_factor():
+    policy = RetryPolicy('work', base_delay_s=5, backoff_factor=4, max_attempts=4)
+
+    assert policy.delays_ms == [5000, 20000, 80000, 320000]
+    assert policy.retry_queues == ['work.retry.5000ms', 'work.retry.20000ms', 'work.retry.80000ms', 'work.retry.320000ms']
+
+
+def test_retry_queues_dead_letter_back_to_the_work_queue():
+    channel = RecordingChannel()
+    RetryPolicy('work', base_delay_s=1, backoff_factor=2, max_attempts=2).declare(channel)
+
+    assert channel.declared == [
+        ('work.retry.1000ms', {"x-message-ttl": 1000, "x-dead-letter-exchange": '', "x-dead-letter-routing-key": 'work'}),
+        ('work.retry.2000ms', {"x-message-ttl": 2000, "x-dead-letter-exchange": '', "x-dead-letter-routing-key": 'work'}),
+    ]
+
+
+def test_schedule_moves_through_the_delays_then_gives_up():
+    channel = RecordingChannel()
+    policy = RetryPolicy('work', base_delay_s=1, backoff_factor=2, max_attempts=2)
+    properties = pika.BasicProperties(content_type='application/json', headers={"trace": "abc"})
+
+    assert policy.schedule(channel, b'{}', properties)
+    routing_key, _, properties = channel.published[-1]
+    assert routing_key == 'work.retry.1000ms'
+    assert properties.headers == {"trace": "abc", ATTEMPT_HEADER: 1}
+    assert properties.content_type == 'application/json'
+
+    assert policy.schedule(channel, b'{}', properties)
+    assert channel.published[-1][0] == 'work.retry.2000ms'
+    assert not policy.can_retry(channel.published[-1][2])
+    assert not policy.schedule(channel, b'{}', channel.published[-1][2])
+    assert len(channel.published) == 2
+
+
+def test_attempt_of_tolerates_missing_or_bad_headers():
+    assert attempt_of(None) == 0
+    assert attempt_of(pika.BasicProperties()) == 0
+    assert attempt_of(pika.BasicProperties(headers={ATTEMPT_HEADER: 'x'})) == 0
+    assert attempt_of(pika.BasicProperties(headers={ATTEMPT_HEADER: 3})) == 3
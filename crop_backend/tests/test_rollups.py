@@ -0,0 +1,55 @@
+import datetime
+
+import pytest
+
+from common.rollups import UNKNOWN, daily_rollup_rows, region_bbox, region_center, region_of
+
+DAY = datetime.date(2025, 3, 1)
+
+
+def test_reports_of_one_group_are_summed():
+    rows = daily_rollup_rows([
+        (DAY, 'wheat', 'rust', 12.4, 77.6, 'vegetative', 0.4, 'HIGH'),
+        (DAY, 'wheat', 'rust', 12.9, 77.1, 'vegetative', 0.6, 'MEDIUM'),
+        (DAY, 'wheat', 'rust', 12.1, 77.9, 'vegetative', None, None),
+    ])
+
+    assert rows == [(DAY, 'wheat', 'rust', '12:77', 'vegetative', 3, 1.0, 2, 1, 1)]
+
+
+def test_missing_and_empty_dimensions_share_the_unknown_row():
+    rows = daily_rollup_rows([
+        (DAY, None, '', None, None, None, 0.9, 'LOW'),
+        (DAY, '', None, None, 77.0, '', 0.8, 'LOW'),
+    ])
+
+    assert len(rows) == 1
+    assert rows[0][:6] == (DAY, UNKNOWN, UNKNOWN, UNKNOWN, UNKNOWN, 2)
+    assert rows[0][6] == pytest.approx(1.7)
+
+
+def test_rows_are_sorted_so_workers_lock_in_the_same_order():
+    reports = [
+        (DAY + datetime.timedelta(days=1), 'rice', 'blast', 1.0, 1.0, 'tillering', 0.5, 'MEDIUM'),
+        (DAY, 'wheat', 'rust', 1.0, 1.0, 'tillering', 0.5, 'MEDIUM'),
+        (DAY, 'rice', 'blast', 1.0, 1.0, 'tillering', 0.5, 'MEDIUM'),
+    ]
+
+    rows = daily_rollup_rows(reports)
+
+    assert rows == sorted(rows)
+    assert rows == daily_rollup_rows(reversed(reports))
+
+
+def test_long_dimensions_are_truncated_to_the_column_width():
+    rows = daily_rollup_rows([(DAY, 'x' * 150, 'rust', 1.0, 1.0, 'tillering', 0.5, 'LOW')])
+
+    assert rows[0][1] == 'x' * 100
+
+
+def test_regions_are_one_degree_cells():
+    assert region_of(12.99, 77.01) == '12:77'
+    assert region_of(-0.5, -179.5) == '-1:-180'
+    assert region_center('12:77') == (12.5, 77.5)
+    assert region_center(UNKNOWN) == (None, None)
+    assert region_bbox('12:77') == [77.0, 12.0, 78.0, 13.0]
@@ -0,0 +1,73 @@
+import pytest
+
+pika = pytest.importorskip('pika')
+pytest.importorskip('prometheus_client')
+
+from common.sharding import HOME_PRIORITY, SHARD_KEY_HEADER, STEAL_PRIORITY, ShardedQueue, desired_replicas, shard_key_of
+from tools.replay_dlq import replay_shard_key
+
+
+class RecordingChannel:
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, properties, **kwargs):
+        self.published.append((exchange, routing_key, properties, kwargs))
+
+
+def test_every_shard_is_home_without_replica_settings():
+    queues = ShardedQueue('work', 'work_dlx', shards=2)
+
+    assert queues.consumer_priorities(None, None) == [
+        ('work.shard.0', HOME_PRIORITY), ('work.shard.1', HOME_PRIORITY), ('work', STEAL_PRIORITY),
+    ]
+
+
+def test_replica_steals_from_shards_it_does_not_own():
+    queues = ShardedQueue('work', 'work_dlx', shards=4)
+
+    assert queues.consumer_priorities('1', '2') == [
+        ('work.shard.0', STEAL_PRIORITY), ('work.shard.1', HOME_PRIORITY),
+        ('work.shard.2', STEAL_PRIORITY), ('work.shard.3', HOME_PRIORITY), ('work', STEAL_PRIORITY),
+    ]
+
+
+@pytest.mark.parametrize("lags, replicas", [
+    ([0, 0, 0, 0], 1),           # Idle: the minimum
+    ([150, 0, 0, 0], 2),         # One replica per target lag of backlog
+    ([101, 101, 101, 0], 4),     # At least one per shard over the target
+    ([5000, 0, 0, 0], 10),       # Capped
+])
+def test_desired_replicas(lags, replicas):
+    assert desired_replicas(lags, target=100, min_replicas=1, max_replicas=10) == replicas
+
+
+def test_publish_routes_by_key_and_records_it():
+    channel = RecordingChannel()
+    queues = ShardedQueue('work', 'work_dlx')
+
+    queues.publish(channel, 42, b'{}', pika.BasicProperties(headers={"trace": "abc"}), mandatory=True)
+
+    exchange, routing_key, properties, kwargs = channel.published[0]
+    assert (exchange, routing_key, kwargs) == ('work.shards', '42', {"mandatory": True})
+    assert properties.headers == {"trace": "abc", SHARD_KEY_HEADER: '42'}
+    assert shard_key_of(properties) == '42'
+
+
+def test_publish_defaults_to_persistent_messages():
+    channel = RecordingChannel()
+    ShardedQueue('work', 'work_dlx').publish(channel, 'k', b'{}')
+
+    assert channel.published[0][2].delivery_mode == 2
+
+
+def test_shard_key_of_decodes_bytes_and_tolerates_no_headers():
+    assert shard_key_of(pika.BasicProperties(headers={SHARD_KEY_HEADER: b'7'})) == '7'
+    assert shard_key_of(pika.BasicProperties()) is None
+    assert shard_key_of(None) is None
+
+
+def test_replay_falls_back_to_the_submission_id():
+    assert replay_shard_key(pika.BasicProperties(headers={SHARD_KEY_HEADER: '12:77'}), b'{"submission_id": 5}') == '12:77'
+    assert replay_shard_key(pika.BasicProperties(), b'{"submission_id": 5}') == 5
+    assert replay_shard_key(pika.BasicProperties(), b'not json') is None
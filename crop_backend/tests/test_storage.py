@@ -0,0 +1,47 @@
+import pytest
+
+from common.storage import LocalStorage, ObjectNotFound, inference_key, original_key, thumbnail_key
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage(str(tmp_path / 'store'))
+    storage.ensure_ready()
+    return storage
+
+
+def test_keys_are_sharded_by_digest():
+    digest = 'ab' + '0' * 62
+
+    assert original_key(digest, 'Leaf.JPG') == f"originals/ab/{digest}.jpg"
+    assert inference_key(digest).startswith(f"variants/ab/{digest}/inference_")
+    assert inference_key(digest).endswith('.png')
+    assert thumbnail_key(digest).endswith('.jpg')
+
+
+@pytest.mark.parametrize("key", ['../outside', 'a/../../outside', '/etc/passwd', '', '.'])
+def test_local_path_rejects_keys_outside_the_root(storage, key):
+    with pytest.raises(ValueError):
+        storage.local_path(key)
+
+
+def test_local_path_allows_keys_that_stay_inside(storage):
+    assert storage.local_path('a/../b/c.jpg') == storage.root + '/b/c.jpg'
+
+
+def test_put_and_get_round_trip(storage, tmp_path):
+    source = tmp_path / 'upload.jpg'
+    source.write_bytes(b'image')
+
+    storage.put_file('originals/aa/x.jpg', str(source))
+    storage.put_bytes('variants/aa/x/thumbnail.jpg', b'thumb')
+
+    assert storage.get_bytes('originals/aa/x.jpg') == b'image'
+    assert storage.exists('variants/aa/x/thumbnail.jpg')
+    assert not [path for path in (tmp_path / 'store').rglob('.tmp-*')]
+
+
+def test_missing_object(storage):
+    assert not storage.exists('originals/aa/missing.jpg')
+    with pytest.raises(ObjectNotFound):
+        storage.get_bytes('originals/aa/missing.jpg')
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from enrichment import TileCache, tile_of
+
+
+def test_hit_after_miss():
+    cache = TileCache('test', ttl_s=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return 'value'
+
+    assert cache.get_or_fetch('k', fetch) == 'value'
+    assert cache.get_or_fetch('k', fetch) == 'value'
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_expired_entry_is_refetched(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = TileCache('test', ttl_s=10)
+    values = iter(['old', 'new'])
+
+    assert cache.get_or_fetch('k', lambda: next(values)) == 'old'
+    now[0] += 11
+    assert cache.get_or_fetch('k', lambda: next(values)) == 'new'
+    assert cache.stats()["misses"] == 2
+
+
+def test_evicts_least_recently_used():
+    cache = TileCache('test', ttl_s=60, max_entries=2)
+    cache.get_or_fetch('a', lambda: 1)
+    cache.get_or_fetch('b', lambda: 2)
+    cache.get_or_fetch('a', lambda: 1) # a is now the most recent
+    cache.get_or_fetch('c', lambda: 3)
+
+    assert cache.get_or_fetch('a', lambda: 'refetched') == 1
+    assert cache.get_or_fetch('b', lambda: 'refetched') == 'refetched'
+    assert cache.stats()["evictions"] == 2
+
+
+def test_concurrent_lookups_share_one_fetch():
+    cache = TileCache('test', ttl_s=60)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'value'
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_fetch('k', fetch)))
+    owner.start()
+    started.wait(5)
+    waiters = [threading.Thread(target=lambda: results.append(cache.get_or_fetch('k', fetch))) for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    while cache.stats()["coalesced"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [owner] + waiters:
+        thread.join(5)
+
+    assert results == ['value'] * 4
+    assert len(calls) == 1
+
+
+def test_failed_fetch_is_not_cached():
+    cache = TileCache('test', ttl_s=60)
+
+    def fail():
+        raise RuntimeError("provider down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_fetch('k', fail)
+    assert cache.get_or_fetch('k', lambda: 'value') == 'value'
+    assert cache.stats()["errors"] == 1
+
+
+def test_tile_of_rounds_to_tile():
+    assert tile_of('12.3449', 77.5651) == (12.34, 77.57)
@@ -0,0 +1,176 @@
+"""
+Moves dead-lettered messages back onto their work queue at a bounded rate.
+
+    python tools/replay_dlq.py --queue submission --dry-run
+    python tools/replay_dlq.py --queue submission --rate 20
+    python tools/replay_dlq.py --queue fusion --limit 500 --max-target-depth 200
+
+Each message is fetched with basic_get and republished with publisher
+confirms. Only then is it acked on the DLQ, so a crash can duplicate one
+message but never lose one. Messages go back through the work queue's
+shard exchange with the shard key they were first published with (the
+x-shard-key header), or keyed by submission id when they predate it.
+SHARD_COUNT must match the workers'.
+
+Replayed messages start again with a fresh retry budget
+(x-retry-attempt is dropped, x-replay-count incremented). Messages already
+replayed --max-replays times are moved to the back of the DLQ instead.
+
+Replay waits while the work queue's shards hold more than --max-target-depth
+ready messages in total, so it does not bury workers that have only just
+recovered. A run
+handles at most the messages that were in the DLQ when it started.
+
+--dry-run reads the same messages without acking them and prints a summary;
+closing the channel puts them back. Requires pika.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+
+import pika
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_ROOT)
+
+from common.retry import ATTEMPT_HEADER, REPLAY_HEADER
+from common.sharding import ShardedQueue, shard_key_of
+
+RABBITMQ_URL = os.environ.get('RABBITMQ_URL', 'amqp://localhost')
+
+# Sharded work queue and DLQ, as declared by the workers
+QUEUES = {
+    "submission": (ShardedQueue("submission_queue", "submission_dlx"), "submission_dlq"),
+    "fusion": (ShardedQueue("fusion_queue", "fusion_dlx"), "fusion_dlq"),
+}
+
+# Broker-set headers describing earlier dead-lettering
+DEATH_HEADERS = ('x-death', 'x-first-death-exchange', 'x-first-death-queue', 'x-first-death-reason')
+
+
+def queue_depth(channel, queue):
+    return channel.queue_declare(queue=queue, passive=True).method.message_count
+
+
+def death_reason(properties):
+    headers = properties.headers or {}
+    return str(headers.get('x-first-death-reason', 'unknown'))
+
+
+def replay_shard_key(properties, body):
+    key = shard_key_of(properties)
+    if key is None:
+        try:
+            key = json.loads(body).get('submission_id')
+        except (ValueError, AttributeError):
+            key = None
+    return key
+
+
+def replay_properties(properties):
+    headers = {k: v for k, v in (properties.headers or {}).items() if k != ATTEMPT_HEADER and k not in DEATH_HEADERS}
+    headers[REPLAY_HEADER] = int(headers.get(REPLAY_HEADER, 0)) + 1
+    return pika.BasicProperties(delivery_mode=2, content_type=properties.content_type, headers=headers)
+
+
+def dry_run(channel, dlq, total):
+    reasons, replays, samples = Counter(), Counter(), []
+    for _ in range(total):
+        method, properties, body = channel.basic_get(queue=dlq, auto_ack=False)
+        if method is None:
+            break
+        reasons[death_reason(properties)] += 1
+        replays[int((properties.headers or {}).get(REPLAY_HEADER, 0))] += 1
+        if len(samples) < 5:
+            samples.append(body.decode(errors='replace'))
+    print(json.dumps({
+        "inspected": sum(reasons.values()),
+        "by_death_reason": dict(reasons),
+        "by_replay_count": {str(k): v for k, v in sorted(replays.items())},
+        "samples": samples,
+    }, indent=2))
+
+
+def replay(connection, channel, shards, dlq, total, args):
+    channel.confirm_delivery()
+    min_interval = 1.0 / args.rate if args.rate > 0 else 0.0
+    counts = Counter()
+    next_publish_at = time.monotonic()
+
+    for handled in range(total):
+        if handled % args.depth_check_every == 0:
+            depth = shards.depth(channel)
+            while depth > args.max_target_depth:
+                print(f"{shards.name} shards have {depth} ready messages (> {args.max_target_depth}); waiting...")
+                connection.sleep(args.depth_wait_s)
+                depth = shards.depth(channel)
+
+        method, properties, body = channel.basic_get(queue=dlq, auto_ack=False)
+        if method is None:
+            break
+
+        if int((properties.headers or {}).get(REPLAY_HEADER, 0)) >= args.max_replays:
+            # Keep it for a human, behind the messages still to be replayed
+            channel.basic_publish(exchange='', routing_key=dlq, body=body, properties=properties, mandatory=True)
+            channel.basic_ack(delivery_tag=method.delivery_tag)
+            counts["kept"] += 1
+            continue
+
+        # connection.sleep keeps heartbeats flowing while rate limiting
+        wait = next_publish_at - time.monotonic()
+        if wait > 0:
+            connection.sleep(wait)
+        next_publish_at = max(next_publish_at + min_interval, time.monotonic())
+
+        try:
+            key = replay_shard_key(properties, body)
+            if key is None:
+                # Not a message this tool understands; the unsharded queue is still consumed
+                channel.basic_publish(exchange='', routing_key=shards.name, body=body, properties=replay_properties(properties), mandatory=True)
+            else:
+                shards.publish(channel, key, body, replay_properties(properties), mandatory=True)
+        except (pika.exceptions.UnroutableError, pika.exceptions.NackError) as e:
+            print(f"Broker refused the replayed message ({e}); leaving it in {dlq} and stopping.")
+            channel.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            break
+        channel.basic_ack(delivery_tag=method.delivery_tag)
+        counts["replayed"] += 1
+        if counts["replayed"] % 100 == 0:
+            print(f"Replayed {counts['replayed']} message(s)...")
+
+    print(f"Replayed {counts['replayed']} message(s) from {dlq} to {shards.exchange}; kept {counts['kept']} over --max-replays.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queue', choices=sorted(QUEUES), required=True)
+    parser.add_argument('--rate', type=float, default=10.0, help='Messages per second; 0 for unlimited')
+    parser.add_argument('--limit', type=int, help='Replay at most this many messages')
+    parser.add_argument('--max-target-depth', type=int, default=100, help='Pause while the work queue has more ready messages')
+    parser.add_argument('--depth-check-every', type=int, default=20, help='Check the work queue depth every N messages')
+    parser.add_argument('--depth-wait-s', type=float, default=5.0)
+    parser.add_argument('--max-replays', type=int, default=3, help='Leave messages replayed this many times in the DLQ')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    shards, dlq = QUEUES[args.queue]
+    connection = pika.BlockingConnection(pika.URLParameters(RABBITMQ_URL))
+    try:
+        channel = connection.channel()
+        total = queue_depth(channel, dlq)
+        if args.limit is not None:
+            total = min(total, args.limit)
+        print(f"{dlq}: handling {total} message(s).")
+        if args.dry_run:
+            dry_run(channel, dlq, total)
+        else:
+            replay(connection, channel, shards, dlq, total, args)
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
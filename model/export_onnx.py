@@ -0,0 +1,141 @@
+"""
+Exports the multi-task classifier trained in the notebook to ONNX for
+ml_service.
+
+Writes <output>.onnx (dynamic batch axis; outputs crop, is_damaged, growth,
+severity, health) and <output>.json with the class names and input
+normalization ml_service needs to decode the outputs.
+
+    python model/export_onnx.py --checkpoint best_multitask_model.pth \\
+        --output model/crop_model.onnx
+
+Class names are read from the label encoders saved in the checkpoint
+(le_crop, le_stage, le_severity). For a clean checkpoint that only holds
+model_state, pass the training CSV with --labels-csv instead; LabelEncoder
+classes are the sorted unique values, so they are rebuilt exactly.
+
+Requires torch and torchvision (not needed by ml_service itself).
+"""
+import os
+import csv
+import json
+import sys
+import argparse
+
+import torch
+from torch import nn
+import torchvision.models as models
+
+# model_version is derived exactly as ml_service derives it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'crop_backend'))
+from common.model_version import file_version
+
+IMG_SIZE = 224
+MEAN = [0.485, 0.456, 0.406]
+STD = [0.229, 0.224, 0.225]
+OUTPUT_NAMES = ["crop", "is_damaged", "growth", "severity", "health"]
+
+
+class MultiHeadResNet(nn.Module):
+    """Same layout as the notebook's model, so its state_dict loads as-is."""
+
+    def __init__(self, num_crops, num_stages, num_severities, backbone_name="resnet50", dropout=0.4, embed_dim=1024):
+        super().__init__()
+        backbone = getattr(models, backbone_name)(weights=None)
+        feat_dim = backbone.fc.in_features
+        backbone.fc = nn.Identity()
+        self.backbone = backbone
+
+        self.project = nn.Sequential(
+            nn.Linear(feat_dim, embed_dim),
+            nn.BatchNorm1d(embed_dim),
+            nn.ReLU(),
+            nn.Dropout(dropout)
+        )
+        self.crop_head = nn.Linear(embed_dim, num_crops)
+        self.damaged_head = nn.Linear(embed_dim, 1)
+        self.growth_head = nn.Linear(embed_dim, num_stages)
+        self.severity_head = nn.Linear(embed_dim, num_severities)
+        self.health_head = nn.Linear(embed_dim, 1)
+
+    def forward(self, x):
+        feats = self.backbone(x)
+        if feats.ndim == 4:
+            feats = feats.flatten(1)
+        proj = self.project(feats)
+        # Tuple in OUTPUT_NAMES order; ONNX export does not keep dict keys
+        return (
+            self.crop_head(proj),
+            self.damaged_head(proj).squeeze(1),
+            self.growth_head(proj),
+            self.severity_head(proj),
+            self.health_head(proj).squeeze(1),
+        )
+
+
+def labels_from_checkpoint(ckpt):
+    encoders = [ckpt.get(key) for key in ("le_crop", "le_stage", "le_severity")]
+    if not all(encoders):
+        return None
+    return [[str(name) for name in encoder.classes_] for encoder in encoders]
+
+
+def labels_from_csv(path):
+    columns = {"crop": set(), "growth_stage": set(), "severity_level": set()}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            if all(row.get(column) for column in columns):
+                for column, values in columns.items():
+                    values.add(row[column])
+    return [sorted(values) for values in columns.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checkpoint', required=True, help='best_multitask_model.pth or clean_model_state.pth')
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crop_model.onnx'))
+    parser.add_argument('--labels-csv', help='dataset_labels_with_severity.csv, if the checkpoint has no label encoders')
+    parser.add_argument('--backbone', default='resnet50')
+    parser.add_argument('--opset', type=int, default=17)
+    parser.add_argument('--model-version', help='Defaults to onnx-<sha256 prefix of the exported file>')
+    args = parser.parse_args()
+
+    ckpt = torch.load(args.checkpoint, map_location='cpu', weights_only=False)
+    labels = labels_from_checkpoint(ckpt)
+    if labels is None:
+        if not args.labels_csv:
+            parser.error("checkpoint has no label encoders; pass --labels-csv")
+        labels = labels_from_csv(args.labels_csv)
+    crops, stages, severities = labels
+
+    model = MultiHeadResNet(len(crops), len(stages), len(severities), backbone_name=args.backbone)
+    model.load_state_dict(ckpt["model_state"])
+    model.eval()
+
+    dummy = torch.zeros(1, 3, IMG_SIZE, IMG_SIZE)
+    torch.onnx.export(
+        model, dummy, args.output,
+        input_names=["image"],
+        output_names=OUTPUT_NAMES,
+        dynamic_axes={"image": {0: "batch"}, **{name: {0: "batch"} for name in OUTPUT_NAMES}},
+        opset_version=args.opset,
+        do_constant_folding=True
+    )
+
+    metadata = {
+        "model_version": args.model_version or file_version(args.output),
+        "img_size": IMG_SIZE,
+        "mean": MEAN,
+        "std": STD,
+        "crop": crops,
+        "growth_stage": stages,
+        "severity_level": severities,
+    }
+    labels_path = os.path.splitext(args.output)[0] + '.json'
+    with open(labels_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    print(f"Exported {args.output} ({metadata['model_version']}) and {labels_path}")
+
+
+if __name__ == '__main__':
+    main()
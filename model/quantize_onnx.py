@@ -0,0 +1,107 @@
+"""
+Builds an INT8 variant of the exported model for CPU serving.
+
+    python model/quantize_onnx.py --input model/crop_model.onnx \\
+        --calibration-dir path/to/val/images
+
+With --calibration-dir the model is statically quantized (QDQ format, per
+channel weights, activations calibrated on up to --calibration-images
+images). Calibration is the better choice for the convolutional backbone.
+Without it, weights are quantized dynamically, which needs no data but
+usually loses more accuracy.
+
+Writes <input>.int8.onnx plus its .json labels, with its own model_version.
+analysis_worker therefore never serves fp32 results from its cache for the
+int8 model, or the other way round. Point ml_service's MODEL_PATH at the
+output to serve it, and compare the two with bench/ml_inference_bench.py.
+
+Requires onnxruntime (the same version as ml_service).
+"""
+import os
+import sys
+import json
+import random
+import argparse
+
+import numpy as np
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+BACKEND_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'crop_backend')
+ML_SERVICE_DIR = os.path.join(BACKEND_ROOT, 'ml_service')
+# preprocess shares its resize with analysis_worker through common/
+sys.path[:0] = [ML_SERVICE_DIR, BACKEND_ROOT]
+
+from common.model_version import file_version
+from preprocess import ImageDecodeError, load_image, to_tensor
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+class ImageDirReader(CalibrationDataReader):
+    """Feeds calibration images one at a time, preprocessed like ml_service does."""
+
+    def __init__(self, image_dir, input_name, labels, limit, seed=42):
+        paths = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(image_dir)
+            for name in names
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+        random.Random(seed).shuffle(paths)
+        self.paths = iter(paths[:limit])
+        self.input_name = input_name
+        self.size = int(labels.get("img_size", 224))
+        self.mean = np.array(labels["mean"], dtype=np.float32)
+        self.std = np.array(labels["std"], dtype=np.float32)
+
+    def get_next(self):
+        for path in self.paths:
+            try:
+                image = load_image(path, self.size)
+            except ImageDecodeError as e:
+                print(f"Skipping {path}: {e}")
+                continue
+            return {self.input_name: to_tensor([image], self.mean, self.std)}
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', required=True, help='fp32 model from export_onnx.py')
+    parser.add_argument('--output', help='Defaults to <input>.int8.onnx')
+    parser.add_argument('--calibration-dir', help='Images for static quantization')
+    parser.add_argument('--calibration-images', type=int, default=200)
+    args = parser.parse_args()
+
+    base, _ = os.path.splitext(args.input)
+    output = args.output or f"{base}.int8.onnx"
+    with open(f"{base}.json") as f:
+        labels = json.load(f)
+
+    if args.calibration_dir:
+        import onnx
+        input_name = onnx.load(args.input, load_external_data=False).graph.input[0].name
+        reader = ImageDirReader(args.calibration_dir, input_name, labels, args.calibration_images)
+        quantize_static(
+            args.input, output, reader,
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8
+        )
+        method = "int8-static"
+    else:
+        quantize_dynamic(args.input, output, weight_type=QuantType.QInt8, per_channel=True)
+        method = "int8-dynamic"
+
+    labels = dict(labels, quantization=method, model_version=file_version(output))
+    labels_path = os.path.splitext(output)[0] + '.json'
+    with open(labels_path, 'w') as f:
+        json.dump(labels, f, indent=2)
+
+    print(f"{method}: {args.input} ({os.path.getsize(args.input) / 1e6:.1f} MB) -> {output} ({os.path.getsize(output) / 1e6:.1f} MB)")
+    print(f"Labels: {labels_path} ({labels['model_version']})")
+
+
+if __name__ == '__main__':
+    main()